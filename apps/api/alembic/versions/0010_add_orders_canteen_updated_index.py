@@ -0,0 +1,24 @@
+"""add orders canteen/updated_at index
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Backs the per-canteen change token used for conditional GETs on /admin/orders
+    op.create_index('ix_orders_canteen_updated', 'orders', ['canteen_id', 'updated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_canteen_updated', table_name='orders')
@@ -0,0 +1,38 @@
+"""add order_number_sequences table
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'order_number_sequences',
+        sa.Column('day', sa.String(length=8), primary_key=True),
+        sa.Column('last', sa.Integer(), nullable=False),
+    )
+    # Continue each day's numbering after the numbers already issued (previously derived from the order id)
+    op.execute(
+        """
+        INSERT INTO order_number_sequences (day, last)
+        SELECT substr(order_number, 1, 8), MAX(CAST(substr(order_number, 10) AS INTEGER))
+        FROM orders
+        WHERE order_number IS NOT NULL
+        GROUP BY substr(order_number, 1, 8)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('order_number_sequences')
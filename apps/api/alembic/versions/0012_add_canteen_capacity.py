@@ -0,0 +1,40 @@
+"""add canteen_capacity table
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'canteen_capacity',
+        sa.Column('canteen_id', sa.Integer(), sa.ForeignKey('canteens.id'), primary_key=True),
+        sa.Column('active', sa.Integer(), nullable=False),
+    )
+    # Start every canteen at its current number of active orders
+    op.execute(
+        """
+        INSERT INTO canteen_capacity (canteen_id, active)
+        SELECT canteens.id, (
+            SELECT COUNT(*) FROM orders
+            WHERE orders.canteen_id = canteens.id
+            AND orders.status IN ('REQUESTED', 'PAYMENT_PENDING', 'PAID', 'PREPARING', 'READY')
+        )
+        FROM canteens
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('canteen_capacity')
@@ -0,0 +1,34 @@
+"""add unique index on active pickup codes
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("status IN ('PAID', 'PREPARING', 'READY')")
+
+
+def upgrade() -> None:
+    # Pickup codes are proposed from a per-worker pool; this is what makes them unique
+    op.create_index(
+        'ix_orders_canteen_active_pickup_code',
+        'orders',
+        ['canteen_id', 'pickup_code'],
+        unique=True,
+        sqlite_where=ACTIVE,
+        postgresql_where=ACTIVE,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_canteen_active_pickup_code', table_name='orders')
@@ -0,0 +1,26 @@
+"""add updated_at to users
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0014'
+down_revision = '0013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Part of the admin order listing's change token, next to orders.updated_at
+    op.add_column('users', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE users SET updated_at = created_at")
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'updated_at')
@@ -0,0 +1,29 @@
+"""add event_bus table
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0015'
+down_revision = '0014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Cross-worker event log for EVENT_BUS_BACKEND=sqlite, pruned by the publishing worker
+    op.create_table(
+        'event_bus',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('message', sa.Text(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('event_bus')
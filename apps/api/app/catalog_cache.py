@@ -0,0 +1,157 @@
+import threading
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from .database import primary_reads
+from .models import Canteen, MenuItem
+from .schemas import CanteenOut, MenuItemOut
+from .http_cache import etag_for
+
+# Published on the event bus so every worker drops its copy
+CATALOG_INVALIDATED = "catalog.invalidated"
+
+
+class CatalogEntry:
+    """One cached snapshot: the items, a lookup by id and the ETag clients revalidate with"""
+
+    def __init__(self, items: list) -> None:
+        self.items = items
+        self.by_id = {item.id: item for item in items}
+        self.etag = etag_for([item.model_dump() for item in items])
+
+
+class CatalogCache:
+    """
+    In-process cache of canteen rows and each canteen's menu.
+
+    Entries are loaded on first use and dropped by invalidate(), which the
+    endpoints that edit a canteen or its menu call after committing. Every
+    invalidation bumps version; a load that raced with one is returned to
+    its caller but not stored, so a stale read never outlives the edit.
+    Loads always read the primary, even from a request on the replica: an
+    entry filled from a lagging replica would keep the old rows after the
+    invalidation that was meant to replace them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.version = 0
+        self._canteens: CatalogEntry | None = None
+        self._active: CatalogEntry | None = None
+        self._menus: dict[int, CatalogEntry] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _canteens_query():
+        return select(Canteen).order_by(Canteen.id)
+
+    @staticmethod
+    def _menu_query(canteen_id: int):
+        return select(MenuItem).where(MenuItem.canteen_id == canteen_id).order_by(MenuItem.id)
+
+    def _cached_canteens(self) -> tuple[CatalogEntry | None, int]:
+        with self._lock:
+            if self._canteens is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return self._canteens, self.version
+
+    def _cached_menu(self, canteen_id: int) -> tuple[CatalogEntry | None, int]:
+        with self._lock:
+            entry = self._menus.get(canteen_id)
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry, self.version
+
+    def _store_canteens(self, canteens: list, version: int) -> CatalogEntry:
+        entry = CatalogEntry([CanteenOut.model_validate(c) for c in canteens])
+        with self._lock:
+            if version == self.version:
+                self._canteens = entry
+                self._active = None
+        return entry
+
+    def _store_menu(self, canteen_id: int, items: list, version: int) -> CatalogEntry:
+        entry = CatalogEntry([MenuItemOut.model_validate(i) for i in items])
+        with self._lock:
+            if version == self.version:
+                self._menus[canteen_id] = entry
+        return entry
+
+    def _active_entry(self, canteens: CatalogEntry) -> CatalogEntry:
+        with self._lock:
+            if self._active is not None and self._canteens is canteens:
+                return self._active
+        active = CatalogEntry([c for c in canteens.items if c.is_active])
+        with self._lock:
+            if self._canteens is canteens:
+                self._active = active
+        return active
+
+    def canteens(self, db: Session) -> CatalogEntry:
+        entry, version = self._cached_canteens()
+        if entry is None:
+            with primary_reads(db):
+                entry = self._store_canteens(db.scalars(self._canteens_query()).all(), version)
+        return entry
+
+    async def canteens_async(self, db: AsyncSession) -> CatalogEntry:
+        entry, version = self._cached_canteens()
+        if entry is None:
+            with primary_reads(db):
+                entry = self._store_canteens((await db.scalars(self._canteens_query())).all(), version)
+        return entry
+
+    def active_canteens(self, db: Session) -> CatalogEntry:
+        return self._active_entry(self.canteens(db))
+
+    async def active_canteens_async(self, db: AsyncSession) -> CatalogEntry:
+        return self._active_entry(await self.canteens_async(db))
+
+    def canteen(self, db: Session, canteen_id: int) -> CanteenOut | None:
+        return self.canteens(db).by_id.get(canteen_id)
+
+    def menu(self, db: Session, canteen_id: int, refresh: bool = False) -> CatalogEntry:
+        entry, version = (None, self.version) if refresh else self._cached_menu(canteen_id)
+        if entry is None:
+            with primary_reads(db):
+                entry = self._store_menu(canteen_id, db.scalars(self._menu_query(canteen_id)).all(), version)
+        return entry
+
+    async def menu_async(self, db: AsyncSession, canteen_id: int) -> CatalogEntry:
+        entry, version = self._cached_menu(canteen_id)
+        if entry is None:
+            with primary_reads(db):
+                items = (await db.scalars(self._menu_query(canteen_id))).all()
+            entry = self._store_menu(canteen_id, items, version)
+        return entry
+
+    def invalidate(self, canteen_id: int | None = None) -> None:
+        """Drop the canteen list and the given canteen's menu (every menu when None)"""
+        with self._lock:
+            self.version += 1
+            self._canteens = None
+            self._active = None
+            if canteen_id is None:
+                self._menus.clear()
+            else:
+                self._menus.pop(canteen_id, None)
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "menus": len(self._menus),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+catalog_cache = CatalogCache()
@@ -7,9 +7,51 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 60 * 24
     payment_timeout_seconds: int = 600  # 10 minutes
+    expiry_sweep_seconds: int = 60  # Fallback scan for unpaid orders whose deadline no worker fired
     timezone: str = "Asia/Kolkata"
     cookie_name: str = "access_token"
     
+    # Connection pool for the sync and async engines (each gets its own pool)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30  # Seconds a request waits for a free connection
+    db_pool_recycle: int = 1800  # Seconds before a connection is replaced, -1 to keep forever
+    db_pool_pre_ping: bool = True
+    
+    # SQLite production mode: WAL, one writer connection and a pool of read-only ones
+    sqlite_wal: bool = True
+    sqlite_read_pool_size: int = 5
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kb: int = 20000
+    
+    # Optional read replica for read-only endpoints
+    database_read_url: str = ""
+    read_your_writes_seconds: float = 5  # After a write, the user's reads stay on the primary this long
+    read_your_writes_cookie: str = "recent_write"  # Signed marker carrying that window to other workers
+    order_page_size: int = 50  # Default page for order listings
+    order_page_size_max: int = 200
+    
+    # Per-request SQL accounting: X-Query-* response headers, heavy or N+1-looking requests are logged
+    query_stats_enabled: bool = True
+    query_budget_warn: int = 30  # Statements in one request before it is logged
+    query_repeat_threshold: int = 5  # One statement shape this many times in a request is flagged as N+1
+    principal_cache_size: int = 10000  # Authenticated users kept in memory
+    principal_cache_ttl_seconds: int = 60
+    
+    # bcrypt runs in its own process pool so logins don't starve order endpoints
+    password_hash_workers: int = 2  # 0 hashes on a thread from the event loop's default executor
+    password_hash_max_pending: int = 32
+    password_hash_timeout_seconds: float = 5.0
+    ws_send_queue_size: int = 100  # Outbound messages buffered per socket before it is dropped
+    ws_replay_buffer_size: int = 1000  # Recent events kept for clients resuming after a reconnect
+    event_queue_size: int = 10000  # Order events waiting for WebSocket fan-out
+    
+    # Event bus shared by uvicorn workers: "local" (single process), "postgres" or "sqlite"
+    event_bus_backend: str = "local"
+    event_bus_url: str = ""  # Defaults to database_url
+    event_bus_channel: str = "order_events"
+    event_bus_poll_interval: float = 0.2  # Seconds, sqlite backend only
+    
     # Google OAuth
     google_client_id: str = ""
     google_client_secret: str = ""
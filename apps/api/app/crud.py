@@ -1,22 +1,35 @@
+import base64
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 import pytz
-import random
-from sqlalchemy import select, func
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, event, func, inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, joinedload, load_only, make_transient_to_detached, noload, selectinload
 from fastapi import HTTPException, status
 from .config import settings
 from .models import (
     User,
     Canteen,
+    CanteenCapacity,
     MenuItem,
     Order,
     OrderItem,
     Payment,
     OrderStatusEvent,
+    OrderNumberSequence,
     OrderStatus,
     PaymentStatus,
     PaymentMethod,
+    UserRole,
+    as_utc,
 )
+from .order_queue import live_queue
+from .expiry import expiry_scheduler
+from .catalog_cache import catalog_cache
+from .schemas import MenuItemOut
+from .pickup_codes import pickup_codes
 
 ACTIVE_STATUSES = {
     OrderStatus.REQUESTED,
@@ -74,32 +87,143 @@ def ist_now() -> datetime:
     return datetime.now(ist)
 
 
-def build_payment_payload(method: PaymentMethod, upi_id: str, amount_cents: int, order_id: int, user_upi_id: str = None) -> str:
+def build_payment_payload(method: PaymentMethod, upi_id: str, amount_cents: int, order_number: str, user_upi_id: str = None) -> str:
     """Build payment payload based on payment method"""
     if method == PaymentMethod.COUNTER:
         return "COUNTER_PAYMENT"  # No QR code needed for counter payments
     
     # For ONLINE payments, generate UPI payment string
     amount = amount_cents / 100
-    return f"upi://pay?pa={upi_id}&am={amount:.2f}&cu=INR&tn=Order%20{order_id}"
+    return f"upi://pay?pa={upi_id}&am={amount:.2f}&cu=INR&tn=Order%20{order_number}"
+
+
+def active_orders_count_query(canteen_id: int):
+    return select(func.count(Order.id)).where(
+        Order.canteen_id == canteen_id,
+        Order.status.in_(list(ACTIVE_STATUSES)),
+    )
+
+
+def canteen_status_query(canteen_id: int | None = None):
+    """
+    Canteen rows with their active-order count and admin, in one statement.
+
+    Covers every active canteen, or a single canteen (active or not) when
+    canteen_id is given. A canteen with several admins yields one row per
+    admin, ordered by admin id.
+    """
+    counts = (
+        select(Order.canteen_id, func.count(Order.id).label("active_orders"))
+        .where(Order.status.in_(list(ACTIVE_STATUSES)))
+        .group_by(Order.canteen_id)
+    )
+    query = select(Canteen)
+    if canteen_id is None:
+        query = query.where(Canteen.is_active == True)
+    else:
+        counts = counts.where(Order.canteen_id == canteen_id)
+        query = query.where(Canteen.id == canteen_id)
+    counts = counts.subquery()
+    return (
+        query.add_columns(func.coalesce(counts.c.active_orders, 0), User)
+        .outerjoin(counts, counts.c.canteen_id == Canteen.id)
+        .outerjoin(User, (User.canteen_id == Canteen.id) & (User.role == UserRole.CANTEEN_ADMIN))
+        .order_by(Canteen.id, User.id)
+    )
 
 
 def count_active_orders(db: Session, canteen_id: int) -> int:
-    return db.scalar(
-        select(func.count(Order.id)).where(
-            Order.canteen_id == canteen_id,
-            Order.status.in_(list(ACTIVE_STATUSES)),
+    return db.scalar(active_orders_count_query(canteen_id)) or 0
+
+
+def order_change_token(
+    db: Session, canteen_id: int, statuses: list[OrderStatus] | None = None
+) -> tuple[int, datetime | None, datetime | None]:
+    """
+    Count and latest updated_at of a canteen's orders in statuses (all orders
+    when None), plus the latest profile edit of their students. Changes
+    whenever a listing of those orders would: an order entering or leaving
+    the set moves the count or bumps its own updated_at.
+    """
+    query = (
+        select(func.count(Order.id), func.max(Order.updated_at), func.max(User.updated_at))
+        .outerjoin(User, User.id == Order.student_id)
+        .where(Order.canteen_id == canteen_id)
+    )
+    if statuses is not None:
+        query = query.where(Order.status.in_(statuses))
+    count, last_updated, students_updated = db.execute(query).one()
+    return count, last_updated, students_updated
+
+
+def encode_order_cursor(order: Order) -> str:
+    """Opaque cursor for the page that starts after order"""
+    raw = f"{as_utc(order.created_at).isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_order_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, order_id = raw.rsplit("|", 1)
+        return as_utc(datetime.fromisoformat(created_at)), int(order_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_orders(query, cursor: str | None, limit: int):
+    """
+    Newest-first keyset page of an order query, continuing after cursor.
+
+    Fetches limit + 1 rows so the caller can tell whether another page exists.
+    """
+    if cursor:
+        created_at, order_id = decode_order_cursor(cursor)
+        query = query.where(
+            or_(
+                Order.created_at < created_at,
+                and_(Order.created_at == created_at, Order.id < order_id),
+            )
         )
-    ) or 0
+    return query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1)
 
 
-def get_canteen_max_orders(db: Session, canteen_id: int) -> int:
-    canteen = db.get(Canteen, canteen_id)
-    return canteen.max_active_orders if canteen else 20
+def order_list_options(view: str = "full") -> list:
+    """
+    Loader options for an order listing.
+
+    Collections are fetched with selectin loads so items and events never
+    multiply into one joined row per (item, event) pair. The summary view
+    skips the event timeline and loads only what a list card shows: item
+    names and quantities, the payment's method and status, and the
+    student's name columns.
+    """
+    if view == "summary":
+        return [
+            selectinload(Order.items).options(
+                load_only(OrderItem.menu_item_id, OrderItem.quantity, OrderItem.unit_price_cents),
+                joinedload(OrderItem.menu_item).load_only(MenuItem.name),
+            ),
+            joinedload(Order.payment).load_only(Payment.method, Payment.status),
+            noload(Order.events),
+            joinedload(Order.student).load_only(User.name, User.roll_number, User.phone_number),
+        ]
+    return [
+        selectinload(Order.items).joinedload(OrderItem.menu_item),
+        joinedload(Order.payment),
+        selectinload(Order.events),
+        joinedload(Order.student),
+    ]
 
 
 def get_order_queue_position(db: Session, order: Order) -> dict:
     """Get the queue position and estimated time for an order"""
+    canteen = catalog_cache.canteen(db, order.canteen_id)
+    return queue_info_for(order, canteen.avg_prep_minutes if canteen else 10)
+
+
+def queue_info_for(order: Order, avg_prep_minutes: int) -> dict:
+    """Queue position from the live queue, without touching the database"""
     # Only include orders that are PAID with successful payments (not PAYMENT_PENDING with failed/pending payments)
     if order.status not in [OrderStatus.PAID, OrderStatus.PREPARING]:
         return {"position": 0, "estimated_minutes": 0}
@@ -108,22 +232,8 @@ def get_order_queue_position(db: Session, order: Order) -> dict:
     if order.payment and order.payment.status != PaymentStatus.SUCCESS:
         return {"position": 0, "estimated_minutes": 0}
     
-    # Get all orders that are ahead in the queue (paid/preparing orders with successful payments created before this one)
-    ahead_orders = db.scalars(
-        select(Order).join(Payment).where(
-            Order.canteen_id == order.canteen_id,
-            Order.status.in_([OrderStatus.PAID, OrderStatus.PREPARING]),
-            Order.paid_at < order.paid_at,
-            Order.id != order.id,
-            Payment.status == PaymentStatus.SUCCESS
-        ).order_by(Order.paid_at)
-    ).all()
-    
-    position = len(ahead_orders) + 1
-    
-    # Calculate estimated time based on canteen's average prep time
-    canteen = db.get(Canteen, order.canteen_id)
-    avg_prep_minutes = canteen.avg_prep_minutes if canteen else 10
+    # Position comes from the in-memory live queue (orders ahead by paid_at)
+    position = live_queue.position(order)
     
     # Estimate: prep time * position (assuming orders are processed sequentially)
     estimated_minutes = avg_prep_minutes * position
@@ -131,40 +241,22 @@ def get_order_queue_position(db: Session, order: Order) -> dict:
     return {
         "position": position,
         "estimated_minutes": estimated_minutes,
-        "total_in_queue": len(ahead_orders) + 1
+        "total_in_queue": live_queue.size(order.canteen_id)
     }
 
 
-def get_admin_order_queue(db: Session, canteen_id: int) -> list[dict]:
-    """Get ordered list of orders for admin dashboard"""
-    # Get all active orders ordered by paid_at (same as student view)
-    orders = db.scalars(
-        select(Order).where(
-            Order.canteen_id == canteen_id,
-            Order.status.in_([OrderStatus.PAYMENT_PENDING, OrderStatus.PAID, OrderStatus.PREPARING, OrderStatus.READY])
-        ).order_by(
-            # Sort by paid_at ascending - first paid gets priority (same as queue position)
-            Order.paid_at.asc()
-        )
-    ).all()
-    
-    result = []
-    queue_position = 1
-    for order in orders:
-        # Only assign queue positions to orders with successful payments
-        if (order.status in [OrderStatus.PAID, OrderStatus.PREPARING] and 
-            order.payment and order.payment.status == PaymentStatus.SUCCESS):
-            queue_info = {"position": queue_position, "estimated_minutes": 0}
-            queue_position += 1
-        else:
-            queue_info = {"position": 0, "estimated_minutes": 0}
-        
-        result.append({
-            "order": order,
-            "queue_info": queue_info
-        })
-    
-    return result
+def get_canteen_queue(db: Session, canteen_id: int) -> list[dict]:
+    """Current queue positions for every queued order in a canteen"""
+    canteen = catalog_cache.canteen(db, canteen_id)
+    avg_prep_minutes = canteen.avg_prep_minutes if canteen else 10
+    return [
+        {
+            "order_id": order_id,
+            "queue_position": position,
+            "estimated_minutes": avg_prep_minutes * position,
+        }
+        for position, order_id in enumerate(live_queue.order_ids(canteen_id), start=1)
+    ]
 
 
 def create_order(db: Session, student: User, canteen_id: int, items: list[dict], payment_method: PaymentMethod = PaymentMethod.ONLINE) -> Order:
@@ -172,24 +264,19 @@ def create_order(db: Session, student: User, canteen_id: int, items: list[dict],
         raise HTTPException(status_code=400, detail="Order must include items")
     # Removed max items limit - students can order as many items as they want
 
-    canteen = db.get(Canteen, canteen_id)
+    # Canteen row and prices come from the catalog cache, not a fresh query per order
+    canteen = catalog_cache.canteen(db, canteen_id)
     if not canteen or not canteen.is_active:
         raise HTTPException(status_code=404, detail="Canteen not found")
 
-    expire_stale_orders(db)
-
-    max_orders = get_canteen_max_orders(db, canteen_id)
-    if count_active_orders(db, canteen_id) >= max_orders:
-        raise HTTPException(status_code=400, detail="Canteen at max active orders")
-
     menu_item_ids = [item["menu_item_id"] for item in items]
     if len(set(menu_item_ids)) != len(menu_item_ids):
         raise HTTPException(status_code=400, detail="Duplicate menu items not allowed")
-    menu_items = db.scalars(
-        select(MenuItem).where(MenuItem.id.in_(menu_item_ids), MenuItem.canteen_id == canteen_id)
-    ).all()
-    menu_map = {item.id: item for item in menu_items}
-    if len(menu_map) != len(menu_item_ids):
+    menu_map = catalog_cache.menu(db, canteen_id).by_id
+    if any(item_id not in menu_map for item_id in menu_item_ids):
+        # Possibly added since the menu was cached; check the database before rejecting
+        menu_map = catalog_cache.menu(db, canteen_id, refresh=True).by_id
+    if any(item_id not in menu_map for item_id in menu_item_ids):
         raise HTTPException(status_code=400, detail="Invalid menu item")
 
     total = 0
@@ -201,56 +288,177 @@ def create_order(db: Session, student: User, canteen_id: int, items: list[dict],
         quantity = item["quantity"]
         total += menu.price_cents * quantity
         order_items.append(
-            OrderItem(menu_item_id=menu.id, quantity=quantity, unit_price_cents=menu.price_cents)
+            OrderItem(
+                menu_item=_attached_menu_item(db, menu),
+                quantity=quantity,
+                unit_price_cents=menu.price_cents,
+            )
         )
 
+    # Normalize legacy payment methods to ONLINE
+    if payment_method in [PaymentMethod.UPI_QR, PaymentMethod.UPI_INTENT]:
+        payment_method = PaymentMethod.ONLINE
+    if not admit_order(db, canteen_id):
+        raise HTTPException(status_code=400, detail="Canteen at max active orders")
+    order_number = next_order_number(db)
+
+    # The whole graph goes out in one flush: the order row, then one batched
+    # insert each for items, payment and event
     order = Order(
-        student_id=student.id,
+        order_number=order_number,
+        student=student,
         canteen_id=canteen_id,
         status=OrderStatus.REQUESTED,
         total_amount_cents=total,
         items=order_items,
+        payment=Payment(
+            amount_cents=total,
+            method=payment_method,
+            status=PaymentStatus.PENDING,
+            qr_payload=build_payment_payload(payment_method, canteen.upi_id, total, order_number),
+        ),
+        events=[OrderStatusEvent(from_status=None, to_status=OrderStatus.REQUESTED, actor_user_id=student.id)],
     )
     db.add(order)
-    db.flush()  # Flush to get the ID
-    
-    # Generate order number in format YYYYMMDD-XXXX
-    from datetime import datetime
-    import pytz
-    
-    # Use IST timezone
-    ist = pytz.timezone('Asia/Kolkata')
-    now_ist = datetime.now(ist)
-    date_str = now_ist.strftime('%Y%m%d')
-    order_number = f"{date_str}-{order.id:04d}"
-    order.order_number = order_number
-    db.flush()  # Flush again to save order_number
-    
-    # Create payment record based on payment method
-    # Normalize legacy payment methods to ONLINE
-    if payment_method in [PaymentMethod.UPI_QR, PaymentMethod.UPI_INTENT]:
-        payment_method = PaymentMethod.ONLINE
-    
-    payment_payload = build_payment_payload(
-        payment_method, 
-        canteen.upi_id, 
-        total, 
-        order.id
+    # Everything the response needs is already on the objects: keep it instead of reloading
+    with _keep_loaded(db):
+        db.commit()
+    return order
+
+
+def admit_order(db: Session, canteen_id: int) -> bool:
+    """
+    Take one of the canteen's max_active_orders slots, or report that none is free.
+
+    The check and the increment are a single conditional upsert on the
+    canteen_capacity row, so concurrent orders can never overshoot the cap.
+    The slot belongs to the caller's transaction: a rollback gives it back.
+    """
+    max_orders = select(Canteen.max_active_orders).where(Canteen.id == canteen_id).scalar_subquery()
+    admitted = db.scalar(
+        _upsert(db, CanteenCapacity)
+        .values(canteen_id=canteen_id, active=1)
+        .on_conflict_do_update(
+            index_elements=[CanteenCapacity.canteen_id],
+            set_={"active": CanteenCapacity.active + 1},
+            where=CanteenCapacity.active < max_orders,
+        )
+        .returning(CanteenCapacity.active)
     )
-    
-    payment = Payment(
-        order_id=order.id,
-        amount_cents=total,
-        method=payment_method,
-        status=PaymentStatus.PENDING,
-        qr_payload=payment_payload,
+    return admitted is not None
+
+
+@event.listens_for(Session, "after_flush")
+def _release_capacity(session: Session, flush_context) -> None:
+    """Orders leaving the active statuses give their canteen_capacity slot back in the same transaction"""
+    released: dict[int, int] = {}
+    for obj in session.dirty:
+        if not isinstance(obj, Order):
+            continue
+        history = inspect(obj).attrs.status.history
+        if any(status in ACTIVE_STATUSES for status in history.deleted) and obj.status not in ACTIVE_STATUSES:
+            released[obj.canteen_id] = released.get(obj.canteen_id, 0) + 1
+    _release_slots(session, released)
+
+
+def _release_slots(session: Session, released: dict[int, int]) -> None:
+    """Give back count canteen_capacity slots per canteen, never going below zero"""
+    for canteen_id, count in released.items():
+        session.execute(
+            update(CanteenCapacity)
+            .where(CanteenCapacity.canteen_id == canteen_id)
+            .values(active=case((CanteenCapacity.active > count, CanteenCapacity.active - count), else_=0))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def rebuild_canteen_capacity(db: Session) -> None:
+    """
+    Reconcile canteen_capacity with the orders table after manual fixes
+    (python -m app.rebuild_capacity); never run on startup.
+
+    Counters are corrected in place, never deleted, so live workers can keep
+    admitting and releasing meanwhile. The capacity rows are locked before
+    counting: admissions still in flight hold those locks, so the count runs
+    after they commit, and new ones wait until the reconcile is done.
+    """
+    canteen_ids = db.scalars(select(Canteen.id)).all()
+    if canteen_ids:
+        db.execute(
+            _upsert(db, CanteenCapacity)
+            .values([{"canteen_id": canteen_id, "active": 0} for canteen_id in canteen_ids])
+            .on_conflict_do_nothing(index_elements=[CanteenCapacity.canteen_id])
+        )
+    db.execute(select(CanteenCapacity.canteen_id).with_for_update()).all()
+    active = (
+        select(func.count(Order.id))
+        .where(Order.canteen_id == CanteenCapacity.canteen_id, Order.status.in_(list(ACTIVE_STATUSES)))
+        .correlate(CanteenCapacity)
+        .scalar_subquery()
     )
-    order.payment = payment
-    
-    _add_event(db, order, None, OrderStatus.REQUESTED, student.id)
+    db.execute(update(CanteenCapacity).values(active=active).execution_options(synchronize_session=False))
     db.commit()
-    db.refresh(order)
-    return order
+
+
+def next_order_number(db: Session) -> str:
+    """Next YYYYMMDD-NNNN order number for today (IST), claimed with a single upsert"""
+    day = ist_now().strftime("%Y%m%d")
+    number = db.scalar(
+        _upsert(db, OrderNumberSequence)
+        .values(day=day, last=1)
+        .on_conflict_do_update(
+            index_elements=[OrderNumberSequence.day],
+            set_={"last": OrderNumberSequence.last + 1},
+        )
+        .returning(OrderNumberSequence.last)
+    )
+    return f"{day}-{number:04d}"
+
+
+def _upsert(db: Session, model):
+    """INSERT for model that supports ON CONFLICT, in the dialect of the session's database"""
+    insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    return insert(model)
+
+
+@contextmanager
+def _keep_loaded(db: Session):
+    """Commit without expiring the session's objects"""
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        yield
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+
+def _attached_menu_item(db: Session, item: MenuItemOut) -> MenuItem:
+    """A cached menu item as a MenuItem in the session, without a SELECT"""
+    menu_item = MenuItem(**item.model_dump())
+    make_transient_to_detached(menu_item)
+    return db.merge(menu_item, load=False)
+
+
+PICKUP_CODE_ATTEMPTS = 5
+
+
+def _assign_pickup_code(db: Session, order: Order) -> None:
+    """
+    Give the order a pickup code in its own SAVEPOINT. The free pool only
+    proposes codes; when another worker committed the same code first, the
+    partial unique index refuses it and we try the next one.
+    """
+    refused: set[int] = set()
+    for _ in range(PICKUP_CODE_ATTEMPTS):
+        pickup_code = pickup_codes.allocate(order.canteen_id, order.id, refused)
+        try:
+            with db.begin_nested():
+                order.pickup_code = pickup_code
+        except IntegrityError:
+            refused.add(int(pickup_code))
+            continue
+        return
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="No pickup codes free")
 
 
 def accept_order(db: Session, order: Order, actor: User) -> Order:
@@ -263,14 +471,13 @@ def accept_order(db: Session, order: Order, actor: User) -> Order:
     if order.payment and order.payment.method == PaymentMethod.COUNTER:
         # For COUNTER payments, skip PAYMENT_PENDING and go directly to PREPARING
         # No payment confirmation needed - admin accepting the order means they'll collect payment at counter
-        pickup_code = generate_pickup_code(db, order.canteen_id)
         order.status = OrderStatus.PREPARING
         order.accepted_at = now
         order.paid_at = now
-        order.pickup_code = pickup_code
         order.payment.status = PaymentStatus.SUCCESS
         order.payment.paid_at = now
         _add_event(db, order, OrderStatus.REQUESTED, OrderStatus.PREPARING, actor.id)
+        _assign_pickup_code(db, order)
     else:
         # For ONLINE payments, go to PAYMENT_PENDING and wait for payment confirmation
         order.status = OrderStatus.PAYMENT_PENDING
@@ -284,7 +491,7 @@ def accept_order(db: Session, order: Order, actor: User) -> Order:
                 PaymentMethod.ONLINE, 
                 order.canteen.upi_id, 
                 order.total_amount_cents, 
-                order.id
+                order.order_number
             )
             
             payment = Payment(
@@ -303,6 +510,10 @@ def accept_order(db: Session, order: Order, actor: User) -> Order:
     
     db.commit()
     db.refresh(order)
+    live_queue.sync(order)
+    pickup_codes.sync(order)
+    if order.status == OrderStatus.PAYMENT_PENDING:
+        expiry_scheduler.schedule(order.id, order.payment_expires_at)
     return order
 
 
@@ -332,16 +543,17 @@ def pay_order(db: Session, order: Order, actor: User) -> Order:
         expire_order(db, order)
         raise HTTPException(status_code=400, detail="Payment window expired")
 
-    pickup_code = generate_pickup_code(db, order.canteen_id)
     order.status = OrderStatus.PAID
     order.paid_at = now
-    order.pickup_code = pickup_code
     if order.payment:
         order.payment.status = PaymentStatus.SUCCESS
         order.payment.paid_at = now
     _add_event(db, order, OrderStatus.PAYMENT_PENDING, OrderStatus.PAID, actor.id)
+    _assign_pickup_code(db, order)
     db.commit()
     db.refresh(order)
+    live_queue.sync(order)
+    pickup_codes.sync(order)
     return order
 
 
@@ -376,60 +588,79 @@ def update_order_status(db: Session, order: Order, actor: User, new_status: Orde
     _add_event(db, order, prev, new_status, actor.id)
     db.commit()
     db.refresh(order)
+    live_queue.sync(order)
+    pickup_codes.sync(order)
     return order
 
 
-def generate_pickup_code(db: Session, canteen_id: int, attempts: int = 5) -> str:
-    for _ in range(attempts):
-        code = f"{random.randint(0, 9999):04d}"
-        exists = db.scalar(
-            select(func.count(Order.id)).where(
-                Order.canteen_id == canteen_id,
-                Order.pickup_code == code,
-                Order.status != OrderStatus.COLLECTED,
-            )
+def _expire_pending_orders(db: Session, *criteria) -> list[Order]:
+    """
+    Time out the PAYMENT_PENDING orders matching criteria and return them.
+
+    The status change is one conditional UPDATE ... RETURNING, so when several
+    workers expire the same deadline each order is claimed by exactly one of
+    them; only the claimed orders get their event, payment and capacity
+    updates, and only they are returned to be announced.
+    """
+    now = utcnow()
+    claimed = db.execute(
+        update(Order)
+        .where(Order.status == OrderStatus.PAYMENT_PENDING, *criteria)
+        .values(status=OrderStatus.CANCELLED_TIMEOUT, cancelled_at=now)
+        .returning(Order.id, Order.canteen_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not claimed:
+        return []
+    order_ids = [order_id for order_id, _ in claimed]
+    db.execute(
+        update(Payment)
+        .where(Payment.order_id.in_(order_ids))
+        .values(status=PaymentStatus.EXPIRED)
+        .execution_options(synchronize_session=False)
+    )
+    db.add_all(
+        OrderStatusEvent(
+            order_id=order_id,
+            from_status=OrderStatus.PAYMENT_PENDING,
+            to_status=OrderStatus.CANCELLED_TIMEOUT,
+            actor_user_id=None,
         )
-        if not exists:
-            return code
-    raise HTTPException(status_code=500, detail="Failed to generate pickup code")
+        for order_id in order_ids
+    )
+    released: dict[int, int] = {}
+    for _, canteen_id in claimed:
+        released[canteen_id] = released.get(canteen_id, 0) + 1
+    _release_slots(db, released)
+    db.commit()
+    return db.scalars(
+        select(Order).where(Order.id.in_(order_ids)).order_by(Order.id).execution_options(populate_existing=True)
+    ).all()
 
 
 def expire_order(db: Session, order: Order) -> Order:
-    now = utcnow()
-    if order.status != OrderStatus.PAYMENT_PENDING:
-        return order
-    order.status = OrderStatus.CANCELLED_TIMEOUT
-    order.cancelled_at = now
-    if order.payment:
-        order.payment.status = PaymentStatus.EXPIRED
-    _add_event(db, order, OrderStatus.PAYMENT_PENDING, OrderStatus.CANCELLED_TIMEOUT, None)
-    db.commit()
-    db.refresh(order)
+    if order.status == OrderStatus.PAYMENT_PENDING:
+        _expire_pending_orders(db, Order.id == order.id)
+        db.refresh(order)
     return order
 
 
 def expire_stale_orders(db: Session) -> list[Order]:
-    now = utcnow()
-    orders = db.scalars(
-        select(Order).where(
-            Order.status == OrderStatus.PAYMENT_PENDING,
-            Order.payment_expires_at.is_not(None),
-            Order.payment_expires_at < now,
-        )
-    ).all()
-    expired: list[Order] = []
-    for order in orders:
-        order.status = OrderStatus.CANCELLED_TIMEOUT
-        order.cancelled_at = now
-        if order.payment:
-            order.payment.status = PaymentStatus.EXPIRED
-        _add_event(db, order, OrderStatus.PAYMENT_PENDING, OrderStatus.CANCELLED_TIMEOUT, None)
-        expired.append(order)
-    if expired:
-        db.commit()
-        for order in expired:
-            db.refresh(order)
-    return expired
+    return _expire_pending_orders(
+        db,
+        Order.payment_expires_at.is_not(None),
+        Order.payment_expires_at < utcnow(),
+    )
+
+
+def expire_due_orders(db: Session, order_ids: list[int]) -> list[Order]:
+    """Expire the given orders if they are still waiting for payment past their deadline"""
+    return _expire_pending_orders(
+        db,
+        Order.id.in_(order_ids),
+        Order.payment_expires_at.is_not(None),
+        Order.payment_expires_at <= utcnow(),
+    )
 
 
 def update_payment_status(db: Session, order: Order, new_status: PaymentStatus, actor: User = None) -> Order:
@@ -445,12 +676,11 @@ def update_payment_status(db: Session, order: Order, new_status: PaymentStatus,
     if new_status == PaymentStatus.SUCCESS:
         # Payment successful - move to PAID status and add to queue
         if order.status == OrderStatus.PAYMENT_PENDING:
-            pickup_code = generate_pickup_code(db, order.canteen_id)
             order.status = OrderStatus.PAID
             order.paid_at = now
-            order.pickup_code = pickup_code
             order.payment.paid_at = now
             _add_event(db, order, OrderStatus.PAYMENT_PENDING, OrderStatus.PAID, actor.id if actor else None)
+            _assign_pickup_code(db, order)
     
     elif new_status == PaymentStatus.FAILED:
         # Payment failed - keep in PAYMENT_PENDING but remove from queue consideration
@@ -466,6 +696,8 @@ def update_payment_status(db: Session, order: Order, new_status: PaymentStatus,
     
     db.commit()
     db.refresh(order)
+    live_queue.sync(order)
+    pickup_codes.sync(order)
     return order
 
 
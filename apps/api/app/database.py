@@ -1,15 +1,267 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .config import settings
+from .db_pool import PoolMetrics, instrumented_pool
+from .read_your_writes import note_recent_write
 
 
 class Base(DeclarativeBase):
     pass
 
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {},
+class RecentWriters:
+    """Users who committed a write recently, whose reads must not hit a lagging replica"""
+
+    def __init__(self, window_seconds: float) -> None:
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._until: dict[int, float] = {}
+
+    def mark(self, user_id: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._until[user_id] = now + self.window_seconds
+            if len(self._until) > 10000:
+                self._until = {uid: until for uid, until in self._until.items() if until > now}
+
+    def __contains__(self, user_id: object) -> bool:
+        with self._lock:
+            until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._until.clear()
+
+
+recent_writers = RecentWriters(settings.read_your_writes_seconds)
+
+
+class RoutingSession(Session):
+    """
+    Sends reads to read_bind and writes to the session's own bind.
+
+    The first flush or DML statement pins the rest of the transaction to the
+    writer, so a transaction always reads back its own changes. With
+    replica=True the read bind may lag behind, so it is only used once the
+    endpoint opted in (info["read_only"], see deps.get_read_db) and the
+    session's user has not written within the read-your-writes window, on
+    this worker (recent_writers) or any other (info["recent_writer"], from
+    the signed marker the write response carried).
+    """
+
+    def __init__(self, *args, read_bind: Engine | None = None, replica: bool = False, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.read_bind = read_bind
+        self.replica = replica
+        self.pinned = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not self.pinned and (self._flushing or getattr(clause, "is_dml", False)):
+            self.pinned = True
+        if self.pinned or self.read_bind is None or not self._may_read_replica():
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return self.read_bind
+
+    def _may_read_replica(self) -> bool:
+        if not self.replica:
+            return True
+        principal = self.info.get("principal")
+        if principal is not None and principal == self.info.get("recent_writer"):
+            return False
+        return self.info.get("read_only", False) and principal not in recent_writers
+
+
+@contextmanager
+def primary_reads(db) -> Iterator[None]:
+    """
+    Keep a read-only session off the replica inside the block. For reads whose
+    result outlives the request, like filling a process-wide cache, where a
+    lagging copy would be served until the next invalidation.
+    """
+    read_only = db.info.pop("read_only", None)
+    try:
+        yield
+    finally:
+        if read_only is not None:
+            db.info["read_only"] = read_only
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _unpin(session: RoutingSession, transaction) -> None:
+    if transaction.parent is None:
+        session.pinned = False
+
+
+@event.listens_for(Session, "after_flush")
+def _note_write(session: Session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_writer(session: Session) -> None:
+    if session.info.pop("wrote", False) and session.info.get("principal") is not None:
+        recent_writers.mark(session.info["principal"])
+        note_recent_write(session.info["principal"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+
+def async_database_url(database_url: str) -> str:
+    """Same database as database_url, through the matching async driver"""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    elif url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+
+def is_sqlite_file(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def pool_options(
+    database_url: str,
+    base: type[QueuePool],
+    metrics: PoolMetrics,
+    pool_size: int | None = None,
+) -> dict:
+    """Pool settings for create_engine; in-memory SQLite keeps SQLAlchemy's default pool"""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and not is_sqlite_file(database_url):
+        return {}
+    return {
+        "poolclass": instrumented_pool(base, metrics),
+        "pool_size": settings.db_pool_size if pool_size is None else pool_size,
+        "max_overflow": metrics.max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def apply_sqlite_pragmas(engine: Engine, read_only: bool = False) -> None:
+    """Tune every new SQLite connection for concurrent readers alongside one writer"""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kb)}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
+sqlite_wal = settings.sqlite_wal and is_sqlite_file(settings.database_url)
+read_pool_metrics = None
+
+if sqlite_wal:
+    # SQLite allows one writer at a time: writes queue on a single pooled connection
+    pool_metrics = PoolMetrics("write", max_overflow=0)
+    engine = create_engine(
+        settings.database_url,
+        connect_args=connect_args,
+        **pool_options(settings.database_url, QueuePool, pool_metrics, pool_size=1),
+    )
+    apply_sqlite_pragmas(engine)
+else:
+    pool_metrics = PoolMetrics("sync", settings.db_max_overflow)
+    engine = create_engine(
+        settings.database_url,
+        connect_args=connect_args,
+        **pool_options(settings.database_url, QueuePool, pool_metrics),
+    )
+pool_metrics.attach(engine)
+
+if settings.database_read_url:
+    read_pool_metrics = PoolMetrics("replica", settings.db_max_overflow)
+    read_engine = create_engine(
+        settings.database_read_url,
+        **pool_options(settings.database_read_url, QueuePool, read_pool_metrics),
+    )
+elif sqlite_wal:
+    read_pool_metrics = PoolMetrics("read", max_overflow=0)
+    read_engine = create_engine(
+        settings.database_url,
+        connect_args=connect_args,
+        **pool_options(settings.database_url, QueuePool, read_pool_metrics, settings.sqlite_read_pool_size),
+    )
+    apply_sqlite_pragmas(read_engine, read_only=True)
+else:
+    read_engine = engine
+if read_pool_metrics is not None:
+    read_pool_metrics.attach(read_engine)
+
+SessionLocal = sessionmaker(
+    bind=engine,
+    class_=RoutingSession,
+    read_bind=read_engine if read_engine is not engine else None,
+    replica=bool(settings.database_read_url),
+    autoflush=False,
+    autocommit=False,
+)
+
+# Async engine for read-heavy endpoints, alongside the sync one
+async_url = async_database_url(settings.database_url)
+if sqlite_wal:
+    # Same split as the sync side: async writes queue on one connection, reads use query_only ones
+    async_pool_metrics = PoolMetrics("async_write", max_overflow=0)
+    async_engine = create_async_engine(
+        async_url,
+        **pool_options(settings.database_url, AsyncAdaptedQueuePool, async_pool_metrics, pool_size=1),
+    )
+    apply_sqlite_pragmas(async_engine.sync_engine)
+else:
+    async_pool_metrics = PoolMetrics("async", settings.db_max_overflow)
+    async_engine = create_async_engine(
+        async_url,
+        **pool_options(settings.database_url, AsyncAdaptedQueuePool, async_pool_metrics),
+    )
+async_pool_metrics.attach(async_engine.sync_engine)
+
+async_read_engine = None
+async_read_pool_metrics = None
+if settings.database_read_url:
+    async_read_pool_metrics = PoolMetrics("async_replica", settings.db_max_overflow)
+    async_read_engine = create_async_engine(
+        async_database_url(settings.database_read_url),
+        **pool_options(settings.database_read_url, AsyncAdaptedQueuePool, async_read_pool_metrics),
+    )
+elif sqlite_wal:
+    async_read_pool_metrics = PoolMetrics("async_read", max_overflow=0)
+    async_read_engine = create_async_engine(
+        async_url,
+        **pool_options(settings.database_url, AsyncAdaptedQueuePool, async_read_pool_metrics, settings.sqlite_read_pool_size),
+    )
+    apply_sqlite_pragmas(async_read_engine.sync_engine, read_only=True)
+if async_read_pool_metrics is not None:
+    async_read_pool_metrics.attach(async_read_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    sync_session_class=RoutingSession,
+    read_bind=async_read_engine.sync_engine if async_read_engine is not None else None,
+    replica=bool(settings.database_read_url),
+    autoflush=False,
+    expire_on_commit=False,
 )
 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+def pool_report() -> dict:
+    pools = [pool_metrics, read_pool_metrics, async_pool_metrics, async_read_pool_metrics]
+    return {metrics.name: metrics.metrics() for metrics in pools if metrics is not None}
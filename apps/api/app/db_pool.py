@@ -0,0 +1,105 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool, QueuePool
+
+
+class PoolMetrics:
+    """
+    Checkout counters for one engine's connection pool.
+
+    Time spent waiting for a connection is measured inside the pool class
+    returned by instrumented_pool(), so exhaustion shows up as waits and
+    timeouts here instead of as unexplained slow requests.
+    """
+
+    def __init__(self, name: str, max_overflow: int = 0) -> None:
+        self.name = name
+        self.max_overflow = max_overflow
+        self._lock = threading.Lock()
+        self._pool: Pool | None = None
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidated = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def attach(self, engine: Engine) -> None:
+        pool = engine.pool
+        self._pool = pool
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "checkin", self._on_checkin)
+        event.listen(pool, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        with self._lock:
+            self.invalidated += 1
+
+    def record_checkout(self, wait_ms: float, waited: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            if waited:
+                self.waits += 1
+
+    def record_timeout(self, wait_ms: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.waits += 1
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def metrics(self) -> dict:
+        pool = self._pool
+        with self._lock:
+            checkouts = self.checkouts or 1
+            data = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidated": self.invalidated,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_ms / checkouts, 3),
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
+        if isinstance(pool, QueuePool):
+            data.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+                max_overflow=self.max_overflow,
+            )
+        return data
+
+
+def instrumented_pool(base: type[QueuePool], metrics: PoolMetrics) -> type[QueuePool]:
+    """Subclass of a QueuePool class that reports checkout waits to metrics"""
+
+    class InstrumentedPool(base):
+        def _do_get(self):
+            # Every connection is in use: this checkout has to wait for a checkin
+            waited = self.checkedout() >= self.size() + max(metrics.max_overflow, 0)
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                metrics.record_timeout((time.perf_counter() - started) * 1000)
+                raise
+            metrics.record_checkout((time.perf_counter() - started) * 1000, waited)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
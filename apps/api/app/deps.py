@@ -1,10 +1,13 @@
 from fastapi import Depends, HTTPException, Request, WebSocket, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from jose import JWTError
-from .database import SessionLocal
+from .database import SessionLocal, AsyncSessionLocal
 from .config import settings
 from .auth import decode_token
 from .models import User, UserRole
+from .principal_cache import principal_cache
+from .read_your_writes import recent_writer
 
 
 def get_db():
@@ -15,7 +18,25 @@ def get_db():
         db.close()
 
 
-def _get_user_from_token(db: Session, token: str) -> User:
+def get_read_db(request: Request, db: Session = Depends(get_db)) -> Session:
+    """get_db for endpoints that never write: reads may be served by the replica"""
+    db.info["read_only"] = True
+    db.info["recent_writer"] = recent_writer(request)
+    return db
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db(request: Request, db: AsyncSession = Depends(get_async_db)) -> AsyncSession:
+    db.info["read_only"] = True
+    db.info["recent_writer"] = recent_writer(request)
+    return db
+
+
+def _decode_subject(token: str) -> tuple[int, str | None]:
     try:
         payload = decode_token(token)
     except JWTError:
@@ -23,13 +44,38 @@ def _get_user_from_token(db: Session, token: str) -> User:
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    user = db.get(User, int(user_id))
+    return int(user_id), payload.get("role")
+
+
+def _get_user_from_token(db: Session, token: str) -> User:
+    user_id, role = _decode_subject(token)
+    db.info["principal"] = user_id
+    # Serve from the principal cache when the snapshot still matches the role claim
+    user = principal_cache.get(db, user_id)
+    if user and user.role.value == role:
+        return user
+    user = db.get(User, user_id, populate_existing=True)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    principal_cache.put(user)
     return user
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+async def _get_user_from_token_async(db: AsyncSession, token: str) -> User:
+    user_id, role = _decode_subject(token)
+    db.info["principal"] = user_id
+    # merge(load=False) does no IO, so the cache can attach to the underlying sync session
+    user = principal_cache.get(db.sync_session, user_id)
+    if user and user.role.value == role:
+        return user
+    user = await db.get(User, user_id, populate_existing=True)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    principal_cache.put(user)
+    return user
+
+
+def _token_from_request(request: Request) -> str:
     # Try to get token from cookie first (for web app)
     token = request.cookies.get(settings.cookie_name)
     
@@ -41,7 +87,15 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
     
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    return _get_user_from_token(db, token)
+    return token
+
+
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+    return _get_user_from_token(db, _token_from_request(request))
+
+
+async def get_current_user_async(request: Request, db: AsyncSession = Depends(get_async_db)) -> User:
+    return await _get_user_from_token_async(db, _token_from_request(request))
 
 
 def get_current_user_ws(websocket: WebSocket, db: Session) -> User:
@@ -58,3 +112,13 @@ def require_role(*roles: UserRole):
         return user
 
     return dependency
+
+
+def require_role_async(*roles: UserRole):
+    """require_role for async endpoints, authenticating through the async session"""
+    async def dependency(user: User = Depends(get_current_user_async)) -> User:
+        if user.role not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+        return user
+
+    return dependency
@@ -0,0 +1,276 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable
+from anyio import to_thread
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    Text,
+    create_engine,
+    delete,
+    func,
+    insert,
+    select,
+)
+from sqlalchemy.engine import make_url
+from .database import apply_sqlite_pragmas, is_sqlite_file
+from .websockets import FULL_PAYLOAD_KEYS
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+Deliver = Callable[[str, dict[str, Any], list[str]], Awaitable[None]]
+Resync = Callable[[], Awaitable[None]]
+
+
+def _encode(event_type: str, payload: dict[str, Any], topics: list[str]) -> str:
+    return json.dumps({"type": event_type, "payload": payload, "topics": topics}, default=str)
+
+
+def _decode(message: str) -> tuple[str, dict[str, Any], list[str]]:
+    data = json.loads(message)
+    return data["type"], data["payload"], data["topics"]
+
+
+class LocalEventBus:
+    """Single-process bus: events are delivered straight back to this worker"""
+
+    def __init__(self) -> None:
+        self._deliver: Deliver | None = None
+
+    async def start(self, deliver: Deliver, resync: Resync | None = None) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+    async def publish(self, event_type: str, payload: dict[str, Any], topics: list[str]) -> None:
+        if self._deliver is not None:
+            await self._deliver(event_type, payload, topics)
+
+
+class PostgresEventBus:
+    """
+    Cross-worker bus over Postgres LISTEN/NOTIFY.
+
+    Every worker LISTENs on the channel with a dedicated autocommit connection
+    watched by the event loop, and publishes with pg_notify from a worker
+    thread. A worker receives its own notifications too, so delivery only
+    happens on the listening side.
+
+    When the LISTEN connection drops, the worker reconnects with a backoff of
+    retry_seconds, doubling up to max_retry_seconds. Notifications sent while
+    it was gone are lost, so once listening again it calls resync to reload
+    whatever state it keeps from events.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        channel: str,
+        retry_seconds: float = 0.5,
+        max_retry_seconds: float = 30.0,
+    ) -> None:
+        self.dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._deliver: Deliver | None = None
+        self._resync: Resync | None = None
+        self._listen_conn = None
+        self._listen_fd: int | None = None
+        self._notify_conn = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._reconnect_task: asyncio.Task | None = None
+
+    async def start(self, deliver: Deliver, resync: Resync | None = None) -> None:
+        self._deliver = deliver
+        self._resync = resync
+        self._loop = asyncio.get_running_loop()
+        self._watch(self._listen())
+        self._notify_conn = self._connect()
+
+    async def stop(self) -> None:
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        self._drop_listener()
+        if self._notify_conn is not None:
+            self._notify_conn.close()
+        self._notify_conn = None
+        self._deliver = None
+        self._resync = None
+
+    def _connect(self):
+        import psycopg2
+
+        # Keepalives make a silently dead peer show up as a read error within a minute
+        conn = psycopg2.connect(self.dsn, keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3)
+        conn.autocommit = True
+        return conn
+
+    def _listen(self):
+        conn = self._connect()
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    def _watch(self, conn) -> None:
+        self._listen_conn = conn
+        # Kept aside: a broken connection can no longer report its fileno()
+        self._listen_fd = conn.fileno()
+        self._loop.add_reader(self._listen_fd, self._on_readable)
+
+    def _drop_listener(self) -> None:
+        if self._loop is not None and self._listen_fd is not None:
+            self._loop.remove_reader(self._listen_fd)
+        if self._listen_conn is not None:
+            self._listen_conn.close()
+        self._listen_conn = None
+        self._listen_fd = None
+
+    async def publish(self, event_type: str, payload: dict[str, Any], topics: list[str]) -> None:
+        message = _encode(event_type, payload, topics)
+        if len(message.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            # Too big for NOTIFY: send the compact event, full-mode clients re-fetch
+            compact = {k: v for k, v in payload.items() if k not in FULL_PAYLOAD_KEYS}
+            message = _encode(event_type, compact, topics)
+        await to_thread.run_sync(self._notify, message)
+
+    def _notify(self, message: str) -> None:
+        if self._notify_conn is None or self._notify_conn.closed:
+            # The previous publish found the connection dead
+            self._notify_conn = self._connect()
+        with self._notify_conn.cursor() as cur:
+            cur.execute("SELECT pg_notify(%s, %s)", (self.channel, message))
+
+    def _on_readable(self) -> None:
+        lost = None
+        try:
+            self._listen_conn.poll()
+        except Exception as e:
+            lost = e
+        while self._listen_conn.notifies:
+            notify = self._listen_conn.notifies.pop(0)
+            if self._deliver is not None:
+                asyncio.ensure_future(self._deliver(*_decode(notify.payload)))
+        if lost is not None:
+            logger.warning("Event bus connection lost: %s", lost)
+            self._drop_listener()
+            if self._reconnect_task is None:
+                self._reconnect_task = asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = self.retry_seconds
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                try:
+                    conn = await to_thread.run_sync(self._listen)
+                except Exception as e:
+                    delay = min(delay * 2, self.max_retry_seconds)
+                    logger.warning("Event bus reconnect failed, retrying in %.1fs: %s", delay, e)
+                    continue
+                self._watch(conn)
+                break
+        finally:
+            self._reconnect_task = None
+        if self._resync is not None:
+            try:
+                await self._resync()
+            except Exception as e:
+                logger.warning("Event bus resync error: %s", e)
+
+
+class SqliteEventBus:
+    """
+    Cross-worker bus for single-host deployments, backed by a SQLite table.
+
+    Workers append events to the table and each one polls for rows newer than
+    the last id it has seen. Rows older than the retention window are pruned
+    by whichever worker publishes.
+    """
+
+    def __init__(self, database_url: str, poll_interval: float = 0.2, retention: int = 1000) -> None:
+        self.engine = create_engine(database_url, connect_args={"check_same_thread": False})
+        if is_sqlite_file(database_url):
+            # Every worker writes here: wait out the other writers instead of failing with "database is locked"
+            apply_sqlite_pragmas(self.engine)
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.metadata = MetaData()
+        self.table = Table(
+            "event_bus",
+            self.metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("message", Text, nullable=False),
+        )
+        self._deliver: Deliver | None = None
+        self._task: asyncio.Task | None = None
+        self._last_id = 0
+
+    async def start(self, deliver: Deliver, resync: Resync | None = None) -> None:
+        self._deliver = deliver
+        self._last_id = await to_thread.run_sync(self._setup)
+        self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self._task = None
+        self._deliver = None
+
+    async def publish(self, event_type: str, payload: dict[str, Any], topics: list[str]) -> None:
+        await to_thread.run_sync(self._append, _encode(event_type, payload, topics))
+
+    def _setup(self) -> int:
+        # Migration 0015 creates the table in the app database; a separate EVENT_BUS_URL file gets it here
+        self.metadata.create_all(self.engine)
+        with self.engine.connect() as conn:
+            return conn.scalar(select(func.max(self.table.c.id))) or 0
+
+    def _append(self, message: str) -> None:
+        with self.engine.begin() as conn:
+            new_id = conn.execute(insert(self.table).values(message=message)).inserted_primary_key[0]
+            if new_id % 100 == 0:
+                conn.execute(delete(self.table).where(self.table.c.id <= new_id - self.retention))
+
+    def _fetch(self, after_id: int) -> list[tuple[int, str]]:
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(self.table.c.id, self.table.c.message)
+                .where(self.table.c.id > after_id)
+                .order_by(self.table.c.id)
+            ).all()
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                rows = await to_thread.run_sync(self._fetch, self._last_id)
+            except Exception as e:
+                logger.warning("Event bus poll error: %s", e)
+                continue
+            for row_id, message in rows:
+                self._last_id = row_id
+                if self._deliver is None:
+                    continue
+                try:
+                    await self._deliver(*_decode(message))
+                except Exception as e:
+                    logger.warning("Event bus delivery error: %s", e)
+
+
+def create_event_bus(backend: str, database_url: str, channel: str, poll_interval: float):
+    if backend == "local":
+        return LocalEventBus()
+    if backend == "postgres":
+        return PostgresEventBus(database_url, channel)
+    if backend == "sqlite":
+        return SqliteEventBus(database_url, poll_interval)
+    raise ValueError(f"Unknown event bus backend: {backend}")
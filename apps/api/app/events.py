@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str, dict[str, Any], list[str]], Awaitable[None]]
+
+
+class EventDispatcher:
+    """
+    Hands order events from request threads to the event loop without waiting.
+
+    publish() is safe to call from sync endpoints running in the threadpool: it
+    schedules the event onto an asyncio queue and returns immediately. run()
+    drains the queue on the event loop and passes each event to the handler
+    (normally ConnectionManager.broadcast), recording how long events waited.
+    """
+
+    def __init__(self, max_queue_size: int = 10000) -> None:
+        self.max_queue_size = max_queue_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue | None = None
+        self.published = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def publish(self, event_type: str, payload: dict[str, Any], topics: Iterable[str]) -> None:
+        if self._loop is None or self._queue is None:
+            # Dispatcher not running (e.g. scripts or tests), nobody is listening
+            self.dropped += 1
+            return
+        event = (time.monotonic(), event_type, payload, list(topics))
+        self._loop.call_soon_threadsafe(self._enqueue, event)
+
+    def _enqueue(self, event: tuple) -> None:
+        if self._queue is None:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(event)
+            self.published += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def run(self, handler: Handler) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        try:
+            while True:
+                enqueued_at, event_type, payload, topics = await self._queue.get()
+                lag_ms = (time.monotonic() - enqueued_at) * 1000
+                self.last_lag_ms = lag_ms
+                self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+                try:
+                    await handler(event_type, payload, topics)
+                    self.dispatched += 1
+                except Exception:
+                    self.failed += 1
+                    logger.exception("Event dispatch error for %s", event_type)
+        finally:
+            self._loop = None
+            self._queue = None
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "published": self.published,
+            "dispatched": self.dispatched,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "last_lag_ms": round(self.last_lag_ms, 3),
+            "max_lag_ms": round(self.max_lag_ms, 3),
+        }
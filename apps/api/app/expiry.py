@@ -0,0 +1,129 @@
+import asyncio
+import heapq
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from anyio import to_thread
+from .models import Order, OrderStatus, as_utc
+
+
+class ExpiryScheduler:
+    """
+    Fires payment expiry for each order at its payment_expires_at deadline.
+
+    Deadlines live in a min-heap. accept_order pushes onto it from the request
+    thread and the event loop sleeps until the earliest deadline (or until a
+    new, earlier deadline wakes it). Deadlines arrive from this worker's
+    accept_order and, through order events on the bus, from every other
+    worker; scheduling the same deadline twice is a no-op. Orders that were
+    paid in the meantime are skipped by the expiry callback, so entries never
+    need to be removed.
+    When the callback fails, its orders go back on the heap with a backoff
+    of retry_seconds, doubling up to max_retry_seconds.
+    """
+
+    def __init__(self, retry_seconds: float = 1.0, max_retry_seconds: float = 60.0) -> None:
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._lock = threading.Lock()
+        self._heap: list[tuple[datetime, int]] = []
+        self._deadlines: dict[int, datetime] = {}  # Live heap entry per order; others are stale
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def schedule(self, order_id: int, deadline: datetime) -> None:
+        deadline = as_utc(deadline)
+        with self._lock:
+            if not self._push(order_id, deadline):
+                return
+            is_earliest = self._heap[0] == (deadline, order_id)
+        if is_earliest:
+            self._wake()
+
+    def load(self, db: Session) -> None:
+        """Schedule every order still waiting for payment (used on startup)"""
+        rows = db.execute(
+            select(Order.id, Order.payment_expires_at).where(
+                Order.status == OrderStatus.PAYMENT_PENDING,
+                Order.payment_expires_at.is_not(None),
+            )
+        ).all()
+        with self._lock:
+            for order_id, expires_at in rows:
+                self._push(order_id, as_utc(expires_at))
+        self._wake()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+            self._deadlines.clear()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._deadlines)
+
+    def _push(self, order_id: int, deadline: datetime) -> bool:
+        if self._deadlines.get(order_id) == deadline:
+            return False
+        self._deadlines[order_id] = deadline
+        heapq.heappush(self._heap, (deadline, order_id))
+        return True
+
+    def pop_due(self, now: datetime | None = None) -> list[int]:
+        now = as_utc(now) if now else datetime.now(timezone.utc)
+        due: list[int] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, order_id = heapq.heappop(self._heap)
+                if self._deadlines.get(order_id) == deadline:
+                    del self._deadlines[order_id]
+                    due.append(order_id)
+        return due
+
+    def _retry(self, order_ids: list[int], delay: float) -> None:
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        with self._lock:
+            for order_id in order_ids:
+                self._push(order_id, retry_at)
+
+    def _next_delay(self) -> float | None:
+        with self._lock:
+            if not self._heap:
+                return None
+            deadline = self._heap[0][0]
+        return max((deadline - datetime.now(timezone.utc)).total_seconds(), 0)
+
+    def _wake(self) -> None:
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self, on_expire: Callable[[list[int]], None]) -> None:
+        """Sleep until each deadline and hand due order ids to on_expire in a worker thread"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        failures = 0
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._next_delay())
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                due = self.pop_due()
+                if due:
+                    try:
+                        await to_thread.run_sync(on_expire, due)
+                        failures = 0
+                    except Exception as e:
+                        failures += 1
+                        delay = min(self.retry_seconds * 2 ** (failures - 1), self.max_retry_seconds)
+                        print(f"Expiry error, retrying {len(due)} orders in {delay:.1f}s: {e}")
+                        self._retry(due, delay)
+        finally:
+            self._loop = None
+            self._wakeup = None
+
+
+expiry_scheduler = ExpiryScheduler()
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable
+from fastapi import HTTPException, status
+from .auth import hash_password, verify_password
+from .config import settings
+
+
+def _timed(fn: Callable[..., Any], *args: Any) -> tuple[Any, float, float]:
+    """Runs in the worker process and reports when it started and how long it took"""
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small dedicated process pool, awaited from the event loop.
+
+    Callers never park a thread: at most max_pending calls are in the pool at
+    once, and a call beyond that is refused with a 503 straight away. A slot
+    is only given back when the worker process has actually finished the
+    hash, so a caller that gave up after timeout seconds (also a 503) can't
+    let the pool be oversubscribed.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 32, timeout: float = 5.0) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = 0
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.total_hash_ms = 0.0
+        self.max_hash_ms = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _admit(self) -> bool:
+        with self._stats_lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self, future: Future | None = None) -> None:
+        with self._stats_lock:
+            self._pending -= 1
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if not self._admit():
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server busy, try again")
+        if self.workers <= 0:
+            # No process pool: hash on a default-executor thread, never on the event loop
+            try:
+                return await asyncio.to_thread(fn, *args)
+            finally:
+                self._release()
+        submitted = time.time()
+        try:
+            future = self._pool().submit(_timed, fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        try:
+            result, started, duration = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            with self._stats_lock:
+                self.timed_out += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server busy, try again")
+        self._record((started - submitted) * 1000, duration * 1000)
+        return result
+
+    def _record(self, wait_ms: float, hash_ms: float) -> None:
+        with self._stats_lock:
+            self.completed += 1
+            self.total_wait_ms += max(wait_ms, 0)
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.total_hash_ms += hash_ms
+            self.max_hash_ms = max(self.max_hash_ms, hash_ms)
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            completed = self.completed or 1
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_queue_wait_ms": round(self.total_wait_ms / completed, 3),
+                "max_queue_wait_ms": round(self.max_wait_ms, 3),
+                "avg_hash_ms": round(self.total_hash_ms / completed, 3),
+                "max_hash_ms": round(self.max_hash_ms, 3),
+            }
+
+
+password_hasher = PasswordHasher(
+    settings.password_hash_workers,
+    settings.password_hash_max_pending,
+    settings.password_hash_timeout_seconds,
+)
@@ -0,0 +1,31 @@
+import hashlib
+import json
+from fastapi import Request, Response, status
+
+# Clients may keep the body but must revalidate it on every use
+REVALIDATE = "private, no-cache"
+
+
+def etag_for(data) -> str:
+    """Strong ETag over the JSON form of data, identical in every worker"""
+    body = json.dumps(data, sort_keys=True, default=str, separators=(",", ":"))
+    return '"' + hashlib.sha1(body.encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Response | None:
+    """
+    Stamp the response with etag, and return a bare 304 to send instead when
+    the client's If-None-Match already has it.
+    """
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,17 +1,17 @@
 import asyncio
 from datetime import datetime, timezone
 from typing import Optional
-from fastapi import FastAPI, Depends, HTTPException, status, Response, WebSocket, WebSocketDisconnect, Request
+from fastapi import FastAPI, Depends, HTTPException, Query, status, Response, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import ORJSONResponse, RedirectResponse
 from starlette.middleware.sessions import SessionMiddleware
 from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
-from anyio import from_thread
 from pydantic import BaseModel
 
 from .config import settings
-from .database import Base, engine, SessionLocal
+from .database import Base, engine, SessionLocal, pool_report
 from .oauth import oauth
 from .models import (
     User,
@@ -41,6 +41,8 @@ from .schemas import (
     MenuItemUpdate,
     OrderCreate,
     OrderOut,
+    OrderSummaryOut,
+    OrderView,
     OrderActionResponse,
     DeclineRequest,
     StatusUpdateRequest,
@@ -56,20 +58,57 @@ from .schemas import (
     HostelResponse,
     HostelListResponse,
 )
-from .auth import verify_password, create_access_token, hash_password
-from .deps import get_db, get_current_user, require_role, get_current_user_ws
+from .auth import create_access_token
+from .hashing import password_hasher
+from .deps import (
+    get_db,
+    get_read_db,
+    get_async_db,
+    get_async_read_db,
+    get_current_user,
+    get_current_user_async,
+    require_role,
+    require_role_async,
+    get_current_user_ws,
+)
 from .crud import (
     create_order,
     accept_order,
     decline_order,
     pay_order,
     update_order_status,
+    expire_due_orders,
     expire_stale_orders,
     build_payment_payload,
+    queue_info_for,
+    get_canteen_queue,
+    order_change_token,
+    canteen_status_query,
+    ist_now,
+    page_orders,
+    order_list_options,
+    encode_order_cursor,
+)
+from .order_queue import live_queue, is_queued
+from .pickup_codes import pickup_codes, holds_code, CODE_STATUSES
+from .principal_cache import principal_cache, PRINCIPAL_INVALIDATED
+from .expiry import expiry_scheduler
+from .catalog_cache import catalog_cache, CATALOG_INVALIDATED
+from .http_cache import etag_for, not_modified
+from .serializers import order_payload, order_summary_payload
+from .query_budget import QueryStatsMiddleware
+from .read_your_writes import ReadYourWritesMiddleware
+from .events import EventDispatcher
+from .event_bus import create_event_bus
+from .websockets import (
+    ConnectionManager,
+    CAMPUS_TOPIC,
+    canteen_topic,
+    student_topic,
+    topics_for_user,
 )
-from .websockets import ConnectionManager
 
-app = FastAPI(title="Campus Canteen Pre-Order API")
+app = FastAPI(title="Campus Canteen Pre-Order API", default_response_class=ORJSONResponse)
 
 # Add session middleware for OAuth
 app.add_middleware(
@@ -77,6 +116,16 @@ app.add_middleware(
     secret_key=settings.jwt_secret,  # Use same secret as JWT
 )
 
+if settings.query_stats_enabled:
+    app.add_middleware(
+        QueryStatsMiddleware,
+        warn_statements=settings.query_budget_warn,
+        repeat_threshold=settings.query_repeat_threshold,
+    )
+
+if settings.database_read_url:
+    app.add_middleware(ReadYourWritesMiddleware, window_seconds=settings.read_your_writes_seconds)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -89,58 +138,154 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Query-Count", "X-Query-Time-Ms", "X-Query-Repeats", "X-Recent-Write"],
 )
 
-manager = ConnectionManager()
+manager = ConnectionManager(settings.ws_send_queue_size, settings.ws_replay_buffer_size)
+dispatcher = EventDispatcher(settings.event_queue_size)
+event_bus = create_event_bus(
+    settings.event_bus_backend,
+    settings.event_bus_url or settings.database_url,
+    settings.event_bus_channel,
+    settings.event_bus_poll_interval,
+)
 
 
-def serialize_order(order: Order, db: Session = None) -> OrderOut:
-    order_dict = OrderOut.model_validate(order).model_dump()
-    
-    # Add student information for admin view
-    if order.student:
-        order_dict["student_name"] = order.student.name
-        order_dict["student_roll_number"] = order.student.roll_number
-        order_dict["student_phone_number"] = order.student.phone_number
-    
-    # Add queue information if database session is available
-    if db and order.status in [OrderStatus.PAID, OrderStatus.PREPARING]:
+def serialize_order(order: Order, db: Session = None, queue_info: dict | None = None, view: OrderView = "full") -> dict:
+    """OrderOut (or OrderSummaryOut for view=summary) as a JSON-ready dict"""
+    # Queue positions come from the live queue index, for listings and single orders alike
+    if queue_info is None and db and order.status in [OrderStatus.PAID, OrderStatus.PREPARING]:
         from .crud import get_order_queue_position
         queue_info = get_order_queue_position(db, order)
-        order_dict["queue_position"] = queue_info["position"]
-        order_dict["estimated_minutes"] = queue_info["estimated_minutes"]
-    
-    return OrderOut(**order_dict)
+    if view == "summary":
+        return order_summary_payload(order, queue_info)
+    return order_payload(order, queue_info)
+
+
+def json_response(content, response: Response | None = None) -> ORJSONResponse:
+    """
+    Send already-serialized content as is, skipping FastAPI's response_model
+    pass; headers set on the injected response are carried over.
+    """
+    return ORJSONResponse(content, headers=dict(response.headers) if response is not None else None)
+
+
+def finish_page(response: Response, orders: list[Order], limit: int) -> list[Order]:
+    """Trim the look-ahead order of a page_orders result and point X-Next-Cursor past the page"""
+    if len(orders) > limit:
+        orders = orders[:limit]
+        response.headers["X-Next-Cursor"] = encode_order_cursor(orders[-1])
+    return orders
+
+
+PageLimit = Query(default=settings.order_page_size, ge=1, le=settings.order_page_size_max)
 
 
-def broadcast_order(event_type: str, order: Order) -> None:
+def broadcast_order(event_type: str, order: Order, order_out: dict | None = None) -> None:
     payload = {
         "order_id": order.id,
         "status": order.status.value,
         "canteen_id": order.canteen_id,
         "student_id": order.student_id,
         "updated_at": order.updated_at.isoformat(),
+        "paid_at": order.paid_at.isoformat() if order.paid_at else None,
+        "payment_expires_at": order.payment_expires_at.isoformat() if order.payment_expires_at else None,
+        "in_queue": is_queued(order),
+        "pickup_code": order.pickup_code if holds_code(order) else None,
         "event_type": event_type,
     }
-    from_thread.run(manager.broadcast, event_type, payload)
+    # Full-mode subscribers get the serialized order and the canteen's queue,
+    # so they can patch local state instead of re-fetching
+    db = Session.object_session(order)
+    if order_out is None and db is not None:
+        order_out = serialize_order(order, db)
+    if order_out is not None:
+        payload["order"] = order_out
+    if db is not None:
+        payload["queue"] = get_canteen_queue(db, order.canteen_id)
+    topics = [canteen_topic(order.canteen_id), student_topic(order.student_id), CAMPUS_TOPIC]
+    # Hand off to the event loop; the request thread never waits on socket sends
+    dispatcher.publish(event_type, payload, topics)
+
+
+def invalidate_catalog(canteen_id: int) -> None:
+    """Drop cached canteen/menu data here now, and in the other workers via the bus"""
+    catalog_cache.invalidate(canteen_id)
+    dispatcher.publish(CATALOG_INVALIDATED, {"canteen_id": canteen_id}, [])
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Drop the cached user here now, and in the other workers via the bus"""
+    principal_cache.invalidate(user_id)
+    dispatcher.publish(PRINCIPAL_INVALIDATED, {"user_id": user_id}, [])
+
+
+def cached_response(request: Request, response: Response, entry):
+    """Serve a catalog entry, or a bare 304 when the client already has this version"""
+    return not_modified(request, response, entry.etag) or entry.items
+
+
+async def deliver_event(event_type: str, payload: dict, topics: list[str]) -> None:
+    """Runs in every worker for every published event, whichever worker produced it"""
+    if event_type == CATALOG_INVALIDATED:
+        catalog_cache.invalidate(payload["canteen_id"])
+        return
+    if event_type == PRINCIPAL_INVALIDATED:
+        principal_cache.invalidate(payload["user_id"])
+        return
+    paid_at = datetime.fromisoformat(payload["paid_at"]) if payload.get("paid_at") else None
+    live_queue.apply(payload["order_id"], payload["canteen_id"], paid_at, payload.get("in_queue", False))
+    pickup_codes.apply(
+        payload["order_id"],
+        payload["canteen_id"],
+        payload.get("pickup_code"),
+        OrderStatus(payload["status"]) in CODE_STATUSES,
+    )
+    if payload["status"] == OrderStatus.PAYMENT_PENDING.value and payload.get("payment_expires_at"):
+        # Every worker watches the deadline, so it still fires if the accepting worker goes away
+        expiry_scheduler.schedule(payload["order_id"], datetime.fromisoformat(payload["payment_expires_at"]))
+    await manager.broadcast(event_type, payload, topics)
 
 
-async def expiry_loop() -> None:
-    while True:
-        await asyncio.sleep(30)
-        await asyncio.to_thread(expire_and_notify)
+def reload_event_state() -> None:
+    db = SessionLocal()
+    try:
+        live_queue.rebuild(db)
+        pickup_codes.rebuild(db)
+        expiry_scheduler.load(db)
+    finally:
+        db.close()
+
+
+async def resync_after_bus_gap() -> None:
+    """The bus reconnected after missing events: reload everything this worker derives from them"""
+    await asyncio.to_thread(reload_event_state)
+    catalog_cache.invalidate()
+    principal_cache.clear()
+    manager.resync_all()
 
 
-def expire_and_notify() -> None:
+def expire_and_notify(order_ids: list[int] | None = None) -> None:
+    """Expire the given due orders, or every stale one when order_ids is None"""
     db = SessionLocal()
     try:
-        expired = expire_stale_orders(db)
+        expired = expire_stale_orders(db) if order_ids is None else expire_due_orders(db, order_ids)
         for order in expired:
             broadcast_order("order.payment_expired", order)
     finally:
         db.close()
 
 
+async def sweep_stale_orders() -> None:
+    """Slow fallback for deadlines the schedulers missed, e.g. while the bus was down"""
+    while True:
+        await asyncio.sleep(settings.expiry_sweep_seconds)
+        try:
+            await asyncio.to_thread(expire_and_notify)
+        except Exception as e:
+            print(f"Expiry sweep error: {e}")
+
+
 @app.on_event("startup")
 async def on_startup() -> None:
     Base.metadata.create_all(bind=engine)
@@ -149,9 +294,21 @@ async def on_startup() -> None:
     db = SessionLocal()
     try:
         seed_data(db)
+        live_queue.rebuild(db)
+        pickup_codes.rebuild(db)
+        expiry_scheduler.load(db)
     finally:
         db.close()
-    asyncio.create_task(expiry_loop())
+    await event_bus.start(deliver_event, resync_after_bus_gap)
+    asyncio.create_task(dispatcher.run(event_bus.publish))
+    asyncio.create_task(expiry_scheduler.run(expire_and_notify))
+    asyncio.create_task(sweep_stale_orders())
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await event_bus.stop()
+    password_hasher.shutdown()
 
 
 @app.get("/health")
@@ -176,13 +333,13 @@ def debug_check_user(email: str, db: Session = Depends(get_db)):
 
 
 @app.get("/debug/test-password")
-def debug_test_password(email: str, password: str, db: Session = Depends(get_db)):
+async def debug_test_password(email: str, password: str, db: AsyncSession = Depends(get_async_db)):
     """Debug endpoint to test password verification"""
-    user = db.scalar(select(User).where(User.email == email))
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         return {"error": "User not found"}
     
-    password_valid = verify_password(password, user.password_hash)
+    password_valid = await password_hasher.verify(password, user.password_hash)
     return {
         "email": user.email,
         "password_valid": password_valid,
@@ -209,7 +366,7 @@ class LoginRequest(BaseModel):
 
 
 @app.post("/auth/login", response_model=AuthResponse)
-def login(payload: LoginRequest, response: Response, db: Session = Depends(get_db)):
+async def login(payload: LoginRequest, response: Response, db: AsyncSession = Depends(get_async_db)):
     if not payload.email and not payload.roll_number:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email or roll number required")
     
@@ -217,10 +374,10 @@ def login(payload: LoginRequest, response: Response, db: Session = Depends(get_d
     
     user = None
     if payload.email:
-        user = db.scalar(select(User).where(User.email == payload.email))
+        user = await db.scalar(select(User).where(User.email == payload.email))
         print(f"User found by email: {user is not None}")
     if not user and payload.roll_number:
-        user = db.scalar(select(User).where(User.roll_number == payload.roll_number))
+        user = await db.scalar(select(User).where(User.roll_number == payload.roll_number))
         print(f"User found by roll: {user is not None}")
     
     if not user:
@@ -228,7 +385,7 @@ def login(payload: LoginRequest, response: Response, db: Session = Depends(get_d
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     
     print(f"Verifying password for user: {user.email}, role: {user.role}")
-    password_valid = verify_password(payload.password, user.password_hash)
+    password_valid = await password_hasher.verify(payload.password, user.password_hash)
     print(f"Password valid: {password_valid}")
     
     if not password_valid:
@@ -283,7 +440,7 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
                 role=UserRole.STUDENT,
                 email=email,
                 roll_number=roll_number,
-                password_hash=hash_password("oauth_user_no_password"),  # Dummy password for OAuth users
+                password_hash=await password_hasher.hash("oauth_user_no_password"),  # Dummy password for OAuth users
                 name=user_info.get('name', roll_number),
                 phone_number="",
             )
@@ -411,7 +568,11 @@ class CampusAdminRegisterRequest(BaseModel):
 
 
 @app.post("/auth/register-campus-admin", response_model=AuthResponse)
-def register_campus_admin(payload: CampusAdminRegisterRequest, response: Response, db: Session = Depends(get_db)):
+async def register_campus_admin(
+    payload: CampusAdminRegisterRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
     """
     One-time setup endpoint to create a campus admin account.
     Requires a setup key for security.
@@ -427,13 +588,13 @@ def register_campus_admin(payload: CampusAdminRegisterRequest, response: Respons
         raise HTTPException(status_code=403, detail="Invalid setup key")
     
     # Check if campus admin already exists
-    existing_admin = db.scalar(select(User).where(User.role == UserRole.CAMPUS_ADMIN))
+    existing_admin = await db.scalar(select(User).where(User.role == UserRole.CAMPUS_ADMIN))
     if existing_admin:
         print(f"Campus admin already exists: {existing_admin.email}")
         raise HTTPException(status_code=400, detail="Campus admin already exists. Contact support to reset.")
     
     # Check if email is already taken
-    existing_user = db.scalar(select(User).where(User.email == payload.email))
+    existing_user = await db.scalar(select(User).where(User.email == payload.email))
     if existing_user:
         print(f"Email already registered: {payload.email}")
         raise HTTPException(status_code=400, detail="Email already registered")
@@ -442,13 +603,12 @@ def register_campus_admin(payload: CampusAdminRegisterRequest, response: Respons
     admin = User(
         role=UserRole.CAMPUS_ADMIN,
         email=payload.email,
-        password_hash=hash_password(payload.password),
+        password_hash=await password_hasher.hash(payload.password),
         name=payload.name,
         phone_number=payload.phone_number,
     )
     db.add(admin)
-    db.commit()
-    db.refresh(admin)
+    await db.commit()
     
     # Create session token
     token = create_access_token(admin.id, admin.role.value)
@@ -483,69 +643,48 @@ def update_profile(
         user.hostel_name = payload.hostel_name.strip()
     
     db.commit()
+    invalidate_principal(user.id)
     db.refresh(user)
     return UserOut.model_validate(user)
 
 
 @app.post("/profile/change-password")
-def change_password(
+async def change_password(
     payload: PasswordChangeRequest,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user_async)
 ):
     """Allow any user to change their password"""
-    # Verify current password
-    if not verify_password(payload.current_password, user.password_hash):
+    # The cached principal carries no password hash: read it from the primary
+    current_hash = await db.scalar(select(User.password_hash).where(User.id == user.id))
+    if not await password_hasher.verify(payload.current_password, current_hash):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Update to new password
-    user.password_hash = hash_password(payload.new_password)
-    db.commit()
+    user.password_hash = await password_hasher.hash(payload.new_password)
+    await db.commit()
+    invalidate_principal(user.id)
     
     return {"status": "ok", "message": "Password changed successfully"}
 
 
 @app.get("/canteens", response_model=list[CanteenOut])
-def list_canteens(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    canteens = db.scalars(select(Canteen).where(Canteen.is_active == True)).all()
-    return [CanteenOut.model_validate(c) for c in canteens]
+async def list_canteens(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
+    user: User = Depends(get_current_user_async),
+):
+    return cached_response(request, response, await catalog_cache.active_canteens_async(db))
 
 
-@app.get("/canteens/{canteen_id}/status")
-def get_canteen_status(
-    canteen_id: int, 
-    db: Session = Depends(get_db), 
-    user: User = Depends(get_current_user)
-):
-    canteen = db.get(Canteen, canteen_id)
-    if not canteen:
-        raise HTTPException(status_code=404, detail="Canteen not found")
-    
-    from .crud import ist_now
-    
-    # Get current IST time
-    current_time = ist_now()
-    current_time_str = current_time.strftime("%H:%M")
-    
+def serialize_canteen_status(canteen: Canteen, active_orders: int, admin: User | None, current_time: str) -> dict:
     # Check if canteen is accepting orders (based on accepting_orders flag)
     is_open = canteen.accepting_orders and canteen.is_active
-    
-    # Get active orders count
-    from .crud import count_active_orders
-    active_orders = count_active_orders(db, canteen_id)
-    
-    # Get canteen admin contact info
-    admin = db.scalar(
-        select(User).where(
-            User.canteen_id == canteen_id,
-            User.role == UserRole.CANTEEN_ADMIN
-        )
-    )
-    
     return {
         "is_open": is_open,
         "accepting_orders": canteen.accepting_orders,
-        "current_time": current_time_str,
+        "current_time": current_time,
         "hours_open": canteen.hours_open,
         "hours_close": canteen.hours_close,
         "active_orders": active_orders,
@@ -557,21 +696,54 @@ def get_canteen_status(
     }
 
 
+@app.get("/canteens/status")
+async def list_canteen_statuses(
+    db: AsyncSession = Depends(get_async_read_db),
+    user: User = Depends(get_current_user_async),
+):
+    """Status of every active canteen in one round trip (home page)"""
+    current_time = ist_now().strftime("%H:%M")
+    statuses: dict[int, dict] = {}
+    for canteen, active_orders, admin in (await db.execute(canteen_status_query())).all():
+        if canteen.id not in statuses:
+            statuses[canteen.id] = {
+                "canteen_id": canteen.id,
+                **serialize_canteen_status(canteen, active_orders, admin, current_time),
+            }
+    return list(statuses.values())
+
+
+@app.get("/canteens/{canteen_id}/status")
+async def get_canteen_status(
+    canteen_id: int, 
+    db: AsyncSession = Depends(get_async_read_db), 
+    user: User = Depends(get_current_user_async)
+):
+    row = (await db.execute(canteen_status_query(canteen_id))).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Canteen not found")
+    canteen, active_orders, admin = row
+    return serialize_canteen_status(canteen, active_orders, admin, ist_now().strftime("%H:%M"))
+
+
 @app.get("/canteens/{canteen_id}/menu", response_model=list[MenuItemOut])
-def canteen_menu(canteen_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+async def canteen_menu(
+    canteen_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
+    user: User = Depends(get_current_user_async),
+):
     # Return ALL menu items (including unavailable ones) so students can see what's out of stock
-    items = db.scalars(
-        select(MenuItem).where(MenuItem.canteen_id == canteen_id)
-    ).all()
-    return [MenuItemOut.model_validate(i) for i in items]
+    return cached_response(request, response, await catalog_cache.menu_async(db, canteen_id))
 
 
 # Mess Menu Endpoints
 @app.get("/mess-menu/today", response_model=MessMenuResponse)
-def get_today_mess_menu(
+async def get_today_mess_menu(
     hostel_name: str,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    user: User = Depends(get_current_user_async)
 ):
     """Get today's mess menu for a specific hostel"""
     # Get current day of week in IST (UTC+5:30)
@@ -581,7 +753,7 @@ def get_today_mess_menu(
     today = datetime.now(timezone.utc) + ist_offset
     day_of_week = today.weekday()
     
-    menu = db.scalar(
+    menu = await db.scalar(
         select(MessMenu).where(
             MessMenu.hostel_name == hostel_name,
             MessMenu.day_of_week == day_of_week
@@ -598,11 +770,11 @@ def get_today_mess_menu(
 
 
 @app.get("/mess-menu", response_model=MessMenuResponse)
-def get_mess_menu(
+async def get_mess_menu(
     hostel_name: str,
     day_of_week: int,  # 0=Monday, 6=Sunday
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    user: User = Depends(get_current_user_async)
 ):
     """Get mess menu for a specific hostel and day of week"""
     if day_of_week < 0 or day_of_week > 6:
@@ -611,7 +783,7 @@ def get_mess_menu(
             detail="Invalid day_of_week. Must be 0-6 (0=Monday, 6=Sunday)"
         )
     
-    menu = db.scalar(
+    menu = await db.scalar(
         select(MessMenu).where(
             MessMenu.hostel_name == hostel_name,
             MessMenu.day_of_week == day_of_week
@@ -640,48 +812,38 @@ def create_order_endpoint(
         [item.model_dump() for item in payload.items],
         payload.payment_method  # Pass payment method to create_order
     )
-    order = db.scalar(
-        select(Order)
-        .where(Order.id == order.id)
-        .options(
-            joinedload(Order.items).joinedload(OrderItem.menu_item),
-            joinedload(Order.payment),
-            joinedload(Order.events),
-        )
-    )
-    broadcast_order("order.created", order)
-    return {"order": serialize_order(order, db)}
+    # create_order hands back the fully populated graph, no reload needed
+    order_out = serialize_order(order, db)
+    broadcast_order("order.created", order, order_out)
+    return {"order": order_out}
 
 
-@app.get("/orders", response_model=list[OrderOut])
+@app.get("/orders", response_model=list[OrderOut | OrderSummaryOut])
 def list_orders(
+    response: Response,
+    limit: int = PageLimit,
+    cursor: Optional[str] = None,
+    view: OrderView = "full",
     db: Session = Depends(get_db),
     user: User = Depends(require_role(UserRole.STUDENT)),
 ):
-    expired = expire_stale_orders(db)
-    for order in expired:
-        broadcast_order("order.payment_expired", order)
-    orders = db.scalars(
+    query = (
         select(Order)
         .where(Order.student_id == user.id)
-        .options(
-            joinedload(Order.items).joinedload(OrderItem.menu_item),
-            joinedload(Order.payment),
-            joinedload(Order.events),
-            joinedload(Order.student),
-        )
-        .order_by(Order.created_at.desc())
-    ).unique().all()
-    return [serialize_order(o, db) for o in orders]
+        .options(*order_list_options(view))
+    )
+    orders = finish_page(response, db.scalars(page_orders(query, cursor, limit)).unique().all(), limit)
+    return json_response([serialize_order(o, db, view=view) for o in orders], response)
 
 
 @app.get("/orders/{order_id}", response_model=OrderOut)
-def get_order(
+async def get_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+    user: User = Depends(get_current_user_async),
 ):
-    order = db.scalar(
+    # Everything the serializer touches is loaded up front: no lazy loads on an AsyncSession
+    order = (await db.scalars(
         select(Order)
         .where(Order.id == order_id)
         .options(
@@ -689,8 +851,9 @@ def get_order(
             joinedload(Order.payment),
             joinedload(Order.events),
             joinedload(Order.student),
+            joinedload(Order.canteen),
         )
-    )
+    )).unique().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     if user.role == UserRole.STUDENT and order.student_id != user.id:
@@ -698,11 +861,8 @@ def get_order(
     if user.role == UserRole.CANTEEN_ADMIN and order.canteen_id != user.canteen_id:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    expired = expire_stale_orders(db)
-    for exp in expired:
-        broadcast_order("order.payment_expired", exp)
-    db.refresh(order)
-    return serialize_order(order, db)
+    queue_info = queue_info_for(order, order.canteen.avg_prep_minutes if order.canteen else 10)
+    return json_response(serialize_order(order, queue_info=queue_info))
 
 
 @app.post("/orders/{order_id}/pay", response_model=OrderActionResponse)
@@ -724,8 +884,9 @@ def pay_order_endpoint(
     if not order or order.student_id != user.id:
         raise HTTPException(status_code=404, detail="Order not found")
     updated = pay_order(db, order, user)
-    broadcast_order("order.updated", updated)
-    return {"order": serialize_order(updated, db)}
+    order_out = serialize_order(updated, db)
+    broadcast_order("order.updated", updated, order_out)
+    return {"order": order_out}
 
 
 @app.post("/orders/{order_id}/payment-callback", response_model=OrderActionResponse)
@@ -806,63 +967,70 @@ def payment_callback_endpoint(
     try:
         db.commit()
         db.refresh(order)
+        live_queue.sync(order)
+        pickup_codes.sync(order)
         
         # Broadcast order update
-        broadcast_order("order.updated", order)
-        
-        return {"order": serialize_order(order, db)}
+        order_out = serialize_order(order, db)
+        broadcast_order("order.updated", order, order_out)
+        return {"order": order_out}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Failed to update payment status")
 
 
-@app.get("/admin/orders", response_model=list[OrderOut])
+@app.get("/admin/orders", response_model=list[OrderOut | OrderSummaryOut])
 def admin_orders(
+    request: Request,
+    response: Response,
     status: Optional[str] = None,
+    limit: int = PageLimit,
+    cursor: Optional[str] = None,
+    view: OrderView = "full",
     db: Session = Depends(get_db),
     user: User = Depends(require_role(UserRole.CANTEEN_ADMIN)),
 ):
     if not user.canteen_id:
         raise HTTPException(status_code=400, detail="Canteen admin missing canteen_id")
     
-    expired = expire_stale_orders(db)
-    for order in expired:
-        if order.canteen_id == user.canteen_id:
-            broadcast_order("order.payment_expired", order)
-    
-    query = select(Order).where(Order.canteen_id == user.canteen_id)
-    
+    statuses = None
     if status:
         status_upper = status.upper()
         if status_upper == "ACTIVE":
-            query = query.where(
-                Order.status.in_(
-                    [
-                        OrderStatus.PAYMENT_PENDING,
-                        OrderStatus.PAID,  # Include PAID for backward compatibility with existing orders
-                        OrderStatus.PREPARING,
-                        OrderStatus.READY,
-                    ]
-                )
-            ).order_by(Order.created_at.desc())
+            statuses = [
+                OrderStatus.PAYMENT_PENDING,
+                OrderStatus.PAID,  # Include PAID for backward compatibility with existing orders
+                OrderStatus.PREPARING,
+                OrderStatus.READY,
+            ]
         else:
             try:
-                status_enum = OrderStatus(status_upper)
-                query = query.where(Order.status == status_enum).order_by(Order.created_at.desc())
+                statuses = [OrderStatus(status_upper)]
             except ValueError as exc:
                 raise HTTPException(status_code=400, detail="Invalid status filter") from exc
-    else:
-        query = query.order_by(Order.created_at.desc())
-        
-    orders = db.scalars(
-        query.options(
-            joinedload(Order.items).joinedload(OrderItem.menu_item),
-            joinedload(Order.payment),
-            joinedload(Order.events),
-            joinedload(Order.student),  # Include student information
-        )
-    ).unique().all()
-    return [serialize_order(o, db) for o in orders]
+    
+    # Dashboard polls usually change nothing: answer those from the change token of the listed orders alone
+    count, last_updated, students_updated = order_change_token(db, user.canteen_id, statuses)
+    canteen = catalog_cache.canteen(db, user.canteen_id)
+    etag = etag_for(
+        [
+            user.canteen_id, status, limit, cursor, view, count, last_updated, students_updated,
+            canteen.avg_prep_minutes if canteen else None,
+        ]
+    )
+    unchanged = not_modified(request, response, etag)
+    if unchanged is not None:
+        return unchanged
+    
+    query = (
+        select(Order)
+        .where(Order.canteen_id == user.canteen_id)
+    )
+    if statuses is not None:
+        query = query.where(Order.status.in_(statuses))
+    query = query.options(*order_list_options(view))
+    orders = finish_page(response, db.scalars(page_orders(query, cursor, limit)).unique().all(), limit)
+    return json_response([serialize_order(o, db, view=view) for o in orders], response)
 
 
 @app.get("/admin/stats/active-orders")
@@ -919,6 +1087,7 @@ def update_canteen_profile(
     
     db.commit()
     db.refresh(canteen)
+    invalidate_catalog(canteen.id)
     return CanteenOut.model_validate(canteen)
 
 
@@ -937,6 +1106,7 @@ def toggle_accepting_orders(
     canteen.accepting_orders = not canteen.accepting_orders
     db.commit()
     db.refresh(canteen)
+    invalidate_catalog(canteen.id)
     return CanteenOut.model_validate(canteen)
 
 
@@ -966,6 +1136,7 @@ def toggle_menu_item(
     item.is_available = not item.is_available
     db.commit()
     db.refresh(item)
+    invalidate_catalog(item.canteen_id)
     return MenuItemOut.model_validate(item)
 
 
@@ -989,8 +1160,9 @@ def accept_order_endpoint(
         raise HTTPException(status_code=404, detail="Order not found")
     
     updated = accept_order(db, order, user)
-    broadcast_order("order.updated", updated)
-    return {"order": serialize_order(updated, db)}
+    order_out = serialize_order(updated, db)
+    broadcast_order("order.updated", updated, order_out)
+    return {"order": order_out}
 
 
 @app.post("/admin/orders/{order_id}/payment-status", response_model=OrderActionResponse)
@@ -1013,8 +1185,9 @@ def update_payment_status_endpoint(
         raise HTTPException(status_code=400, detail="Invalid payment status")
     
     updated = update_payment_status(db, order, new_status, user)
-    broadcast_order("order.updated", updated)
-    return {"order": serialize_order(updated, db)}
+    order_out = serialize_order(updated, db)
+    broadcast_order("order.updated", updated, order_out)
+    return {"order": order_out}
 
 
 @app.post("/admin/orders/{order_id}/cancel-failed-payment", response_model=OrderActionResponse)
@@ -1029,8 +1202,9 @@ def cancel_failed_payment_endpoint(
     
     from .crud import cancel_failed_payment_order
     updated = cancel_failed_payment_order(db, order, user)
-    broadcast_order("order.updated", updated)
-    return {"order": serialize_order(updated, db)}
+    order_out = serialize_order(updated, db)
+    broadcast_order("order.updated", updated, order_out)
+    return {"order": order_out}
 
 
 @app.post("/admin/orders/{order_id}/fix-payment", response_model=OrderActionResponse)
@@ -1064,7 +1238,7 @@ def fix_payment_endpoint(
         PaymentMethod.UPI_QR, 
         order.canteen.upi_id, 
         order.total_amount_cents, 
-        order.id
+        order.order_number
     )
     
     payment = Payment(
@@ -1078,8 +1252,9 @@ def fix_payment_endpoint(
     db.commit()
     db.refresh(order)
     
-    broadcast_order("order.updated", order)
-    return {"order": serialize_order(order, db)}
+    order_out = serialize_order(order, db)
+    broadcast_order("order.updated", order, order_out)
+    return {"order": order_out}
 
 
 @app.post("/admin/orders/{order_id}/decline", response_model=OrderActionResponse)
@@ -1093,8 +1268,9 @@ def decline_order_endpoint(
     if not order or order.canteen_id != user.canteen_id:
         raise HTTPException(status_code=404, detail="Order not found")
     updated = decline_order(db, order, user, payload.reason)
-    broadcast_order("order.updated", updated)
-    return {"order": serialize_order(updated, db)}
+    order_out = serialize_order(updated, db)
+    broadcast_order("order.updated", updated, order_out)
+    return {"order": order_out}
 
 
 @app.post("/admin/orders/{order_id}/status", response_model=OrderActionResponse)
@@ -1116,14 +1292,19 @@ def update_status_endpoint(
             raise HTTPException(status_code=400, detail="Invalid pickup code")
     
     updated = update_order_status(db, order, user, payload.status)
-    broadcast_order("order.updated", updated)
-    return {"order": serialize_order(updated, db)}
+    order_out = serialize_order(updated, db)
+    broadcast_order("order.updated", updated, order_out)
+    return {"order": order_out}
 
 
-@app.get("/admin/orders/daily", response_model=list[OrderOut])
+@app.get("/admin/orders/daily", response_model=list[OrderOut | OrderSummaryOut])
 def daily_orders(
     date: str,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = PageLimit,
+    cursor: Optional[str] = None,
+    view: OrderView = "full",
+    db: Session = Depends(get_read_db),
     user: User = Depends(require_role(UserRole.CANTEEN_ADMIN)),
 ):
     try:
@@ -1133,27 +1314,22 @@ def daily_orders(
 
     start = datetime.combine(target_date, datetime.min.time()).replace(tzinfo=timezone.utc)
     end = datetime.combine(target_date, datetime.max.time()).replace(tzinfo=timezone.utc)
-    orders = db.scalars(
+    query = (
         select(Order)
         .where(
             Order.canteen_id == user.canteen_id,
             Order.created_at >= start,
             Order.created_at <= end,
         )
-        .options(
-            joinedload(Order.items).joinedload(OrderItem.menu_item),
-            joinedload(Order.payment),
-            joinedload(Order.events),
-            joinedload(Order.student),
-        )
-        .order_by(Order.created_at.desc())
-    ).unique().all()
-    return [serialize_order(o, db) for o in orders]
+        .options(*order_list_options(view))
+    )
+    orders = finish_page(response, db.scalars(page_orders(query, cursor, limit)).unique().all(), limit)
+    return json_response([serialize_order(o, db, view=view) for o in orders], response)
 
 
 @app.get("/admin/stats", response_model=list[StatsOut])
 def admin_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user: User = Depends(require_role(UserRole.CAMPUS_ADMIN)),
 ):
     rows = db.execute(
@@ -1172,6 +1348,19 @@ def admin_stats(
     ]
 
 
+@app.get("/campus/metrics")
+def campus_metrics(user: User = Depends(require_role(UserRole.CAMPUS_ADMIN))):
+    """Runtime metrics for the campus admin (event fan-out, pools, caches)"""
+    return {
+        "database_pool": pool_report(),
+        "events": dispatcher.metrics(),
+        "websocket_connections": len(manager.active_connections),
+        "principal_cache": principal_cache.metrics(),
+        "catalog_cache": catalog_cache.metrics(),
+        "password_hashing": password_hasher.metrics(),
+    }
+
+
 # Campus Admin endpoints for managing canteens
 @app.post("/campus/canteens", response_model=CanteenOut)
 def create_canteen(
@@ -1192,6 +1381,7 @@ def create_canteen(
     db.add(canteen)
     db.commit()
     db.refresh(canteen)
+    invalidate_catalog(canteen.id)
     return CanteenOut.model_validate(canteen)
 
 
@@ -1222,6 +1412,7 @@ def update_canteen(
     
     db.commit()
     db.refresh(canteen)
+    invalidate_catalog(canteen.id)
     return CanteenOut.model_validate(canteen)
 
 
@@ -1239,6 +1430,7 @@ def delete_canteen(
     # Soft delete by marking as inactive
     canteen.is_active = False
     db.commit()
+    invalidate_catalog(canteen_id)
     return {"status": "ok", "message": f"Canteen {canteen.name} has been deactivated"}
 
 
@@ -1267,6 +1459,7 @@ def create_menu_item_campus(
     db.add(item)
     db.commit()
     db.refresh(item)
+    invalidate_catalog(canteen_id)
     return MenuItemOut.model_validate(item)
 
 
@@ -1295,6 +1488,7 @@ def update_menu_item_campus(
     
     db.commit()
     db.refresh(item)
+    invalidate_catalog(canteen_id)
     return MenuItemOut.model_validate(item)
 
 
@@ -1312,15 +1506,16 @@ def delete_menu_item_campus(
     
     db.delete(item)
     db.commit()
+    invalidate_catalog(canteen_id)
     return {"status": "ok", "message": f"Menu item {item.name} has been deleted"}
 
 
 @app.put("/campus/canteens/{canteen_id}/admin-email")
-def update_canteen_admin_email(
+async def update_canteen_admin_email(
     canteen_id: int,
     payload: dict,
-    db: Session = Depends(get_db),
-    user: User = Depends(require_role(UserRole.CAMPUS_ADMIN)),
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(require_role_async(UserRole.CAMPUS_ADMIN)),
 ):
     """Campus Admin can update the email of a canteen admin or create one if it doesn't exist"""
     import secrets
@@ -1331,17 +1526,17 @@ def update_canteen_admin_email(
         raise HTTPException(status_code=400, detail="Email is required")
     
     # Verify canteen exists
-    canteen = db.scalar(select(Canteen).where(Canteen.id == canteen_id))
+    canteen = await db.scalar(select(Canteen).where(Canteen.id == canteen_id))
     if not canteen:
         raise HTTPException(status_code=404, detail="Canteen not found")
     
     # Check if email is already in use by another user
-    existing_user = db.scalar(select(User).where(User.email == new_email))
+    existing_user = await db.scalar(select(User).where(User.email == new_email))
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already in use")
     
     # Find the canteen admin for this canteen
-    canteen_admin = db.scalar(
+    canteen_admin = await db.scalar(
         select(User).where(
             User.canteen_id == canteen_id,
             User.role == UserRole.CANTEEN_ADMIN
@@ -1351,8 +1546,8 @@ def update_canteen_admin_email(
     if canteen_admin:
         # Update existing admin's email
         canteen_admin.email = new_email
-        db.commit()
-        db.refresh(canteen_admin)
+        await db.commit()
+        invalidate_principal(canteen_admin.id)
         
         return {
             "status": "ok", 
@@ -1370,15 +1565,14 @@ def update_canteen_admin_email(
         new_admin = User(
             role=UserRole.CANTEEN_ADMIN,
             email=new_email,
-            password_hash=hash_password(temp_password),
+            password_hash=await password_hasher.hash(temp_password),
             canteen_id=canteen_id,
             name=f"{canteen.name} Admin",
             phone_number=""
         )
         
         db.add(new_admin)
-        db.commit()
-        db.refresh(new_admin)
+        await db.commit()
         
         print(f"Created user with ID: {new_admin.id}, email: {new_admin.email}")
         
@@ -1503,12 +1697,12 @@ def list_mess_menus(
 
 # Public Hostel Endpoints (for students to view hostel list)
 @app.get("/hostels", response_model=HostelListResponse)
-def list_hostels_public(
-    db: Session = Depends(get_db),
+async def list_hostels_public(
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """Public endpoint to list all hostels (for student profile dropdown)"""
     query = select(Hostel).order_by(Hostel.name)
-    hostels = db.scalars(query).all()
+    hostels = (await db.scalars(query)).all()
     
     return HostelListResponse(
         total=len(hostels),
@@ -1629,13 +1823,25 @@ async def orders_ws(websocket: WebSocket):
     try:
         # Try to authenticate user, but don't fail if not authenticated
         try:
-            get_current_user_ws(websocket, db)
+            user = get_current_user_ws(websocket, db)
         except HTTPException:
             # If authentication fails, close the connection gracefully
             await websocket.close(code=1008, reason="Authentication required")
             return
         
-        await manager.connect(websocket)
+        # Subscribe only to events this user is allowed to see
+        topics = topics_for_user(user)
+        # ?mode=full opts into events carrying the serialized order and queue
+        full = websocket.query_params.get("mode") == "full"
+        # ?since=<seq>&stream=<id> resumes after a dropped connection
+        since = websocket.query_params.get("since")
+        await manager.connect(
+            websocket,
+            topics,
+            full=full,
+            since=int(since) if since and since.isdigit() else None,
+            stream=websocket.query_params.get("stream"),
+        )
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
@@ -1,14 +1,21 @@
 import enum
 from datetime import datetime, timezone
 from typing import Optional
-from sqlalchemy import String, Integer, DateTime, Boolean, ForeignKey, Enum, Text, Index
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Integer, DateTime, Boolean, ForeignKey, Enum, Text, Index, event
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 from .database import Base
 
 def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def as_utc(dt: datetime) -> datetime:
+    """SQLite hands back naive datetimes, treat them as UTC"""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
 class UserRole(str, enum.Enum):
     STUDENT = "STUDENT"
     CANTEEN_ADMIN = "CANTEEN_ADMIN"
@@ -56,6 +63,8 @@ class User(Base):
     hostel_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
     
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    # Moves on profile edits, so order listings showing the student can tell their copy is stale
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
 
     canteen: Mapped[Optional["Canteen"]] = relationship(back_populates="admins")
     orders: Mapped[list["Order"]] = relationship(back_populates="student")
@@ -79,6 +88,14 @@ class Canteen(Base):
     admins: Mapped[list[User]] = relationship(back_populates="canteen")
 
 
+class CanteenCapacity(Base):
+    """Running count of a canteen's active orders; admission is a conditional update of this row"""
+    __tablename__ = "canteen_capacity"
+
+    canteen_id: Mapped[int] = mapped_column(ForeignKey("canteens.id"), primary_key=True)
+    active: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
 class MenuItem(Base):
     __tablename__ = "menu_items"
 
@@ -98,7 +115,8 @@ class Order(Base):
     order_number: Mapped[str | None] = mapped_column(String(13), nullable=True, unique=True, index=True)
     student_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     canteen_id: Mapped[int] = mapped_column(ForeignKey("canteens.id"), nullable=False)
-    status: Mapped[OrderStatus] = mapped_column(Enum(OrderStatus), nullable=False)
+    # active_history: _release_capacity needs the old status even when it was never loaded
+    status: Mapped[OrderStatus] = mapped_column(Enum(OrderStatus), nullable=False, active_history=True)
     total_amount_cents: Mapped[int] = mapped_column(Integer, nullable=False)
     payment_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     accepted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -119,6 +137,16 @@ class Order(Base):
 
 Index("ix_orders_canteen_status_created", Order.canteen_id, Order.status, Order.created_at)
 Index("ix_orders_student_created", Order.student_id, Order.created_at)
+Index("ix_orders_canteen_updated", Order.canteen_id, Order.updated_at)
+# Two active orders at one canteen can never share a pickup code, whichever worker handed it out
+Index(
+    "ix_orders_canteen_active_pickup_code",
+    Order.canteen_id,
+    Order.pickup_code,
+    unique=True,
+    sqlite_where=Order.status.in_(["PAID", "PREPARING", "READY"]),
+    postgresql_where=Order.status.in_(["PAID", "PREPARING", "READY"]),
+)
 
 
 class OrderItem(Base):
@@ -160,6 +188,23 @@ class Payment(Base):
 Index("ix_payments_order", Payment.order_id)
 
 
+@event.listens_for(Session, "before_flush")
+def _touch_orders_with_changed_payments(session: Session, flush_context, instances) -> None:
+    """A payment change is a change to its order, so Order.updated_at works as a change token"""
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Payment) and obj.order is not None and obj.order not in session.new:
+            if obj in session.new or session.is_modified(obj):
+                obj.order.updated_at = utcnow()
+
+
+class OrderNumberSequence(Base):
+    """Last order number handed out on each day (IST), so a new order knows its number before it is inserted"""
+    __tablename__ = "order_number_sequences"
+
+    day: Mapped[str] = mapped_column(String(8), primary_key=True)  # YYYYMMDD
+    last: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
 class OrderStatusEvent(Base):
     __tablename__ = "order_status_events"
 
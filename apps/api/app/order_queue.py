@@ -0,0 +1,105 @@
+import bisect
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from .models import Order, OrderStatus, PaymentStatus, as_utc
+
+QUEUE_STATUSES = {OrderStatus.PAID, OrderStatus.PREPARING}
+
+
+def _queue_key(order_id: int, paid_at: datetime | None) -> tuple[datetime, int]:
+    paid_at = as_utc(paid_at) if paid_at else datetime.min.replace(tzinfo=timezone.utc)
+    return (paid_at, order_id)
+
+
+def is_queued(order: Order) -> bool:
+    """An order holds a queue slot while it is PAID/PREPARING with a successful payment"""
+    return (
+        order.status in QUEUE_STATUSES
+        and order.payment is not None
+        and order.payment.status == PaymentStatus.SUCCESS
+    )
+
+
+class LiveQueueIndex:
+    """
+    Per-canteen kitchen queue kept in memory, ordered by paid_at.
+
+    Each canteen maps to a sorted list of (paid_at, order_id) keys so a queue
+    position is a bisect instead of a ranking query. CRUD functions call
+    sync() after every commit that can move an order in or out of the queue,
+    and rebuild() reloads everything from the database on startup.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._queues: dict[int, list[tuple[datetime, int]]] = {}
+        self._keys: dict[int, tuple[int, tuple[datetime, int]]] = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._queues.clear()
+            self._keys.clear()
+
+    def rebuild(self, db: Session) -> None:
+        orders = db.scalars(
+            select(Order)
+            .where(Order.status.in_(list(QUEUE_STATUSES)))
+            .options(joinedload(Order.payment))
+        ).all()
+        with self._lock:
+            self._queues.clear()
+            self._keys.clear()
+            for order in orders:
+                if is_queued(order):
+                    self._insert(order.id, order.canteen_id, order.paid_at)
+
+    def sync(self, order: Order) -> None:
+        """Add, move or drop an order depending on its current state"""
+        self.apply(order.id, order.canteen_id, order.paid_at, is_queued(order))
+
+    def apply(self, order_id: int, canteen_id: int, paid_at: datetime | None, queued: bool) -> None:
+        """Same as sync() but from plain values, e.g. an event published by another worker"""
+        with self._lock:
+            self._remove(order_id)
+            if queued:
+                self._insert(order_id, canteen_id, paid_at)
+
+    def position(self, order: Order) -> int:
+        """1-based position of the order within its canteen queue"""
+        key = _queue_key(order.id, order.paid_at)
+        with self._lock:
+            queue = self._queues.get(order.canteen_id, [])
+            return bisect.bisect_left(queue, key) + 1
+
+    def order_ids(self, canteen_id: int) -> list[int]:
+        """Order ids in queue order"""
+        with self._lock:
+            return [order_id for _, order_id in self._queues.get(canteen_id, [])]
+
+    def size(self, canteen_id: int) -> int:
+        with self._lock:
+            return len(self._queues.get(canteen_id, []))
+
+    def _insert(self, order_id: int, canteen_id: int, paid_at: datetime | None) -> None:
+        key = _queue_key(order_id, paid_at)
+        bisect.insort(self._queues.setdefault(canteen_id, []), key)
+        self._keys[order_id] = (canteen_id, key)
+
+    def _remove(self, order_id: int) -> None:
+        entry = self._keys.pop(order_id, None)
+        if entry is None:
+            return
+        canteen_id, key = entry
+        queue = self._queues.get(canteen_id)
+        if not queue:
+            return
+        idx = bisect.bisect_left(queue, key)
+        if idx < len(queue) and queue[idx] == key:
+            del queue[idx]
+        if not queue:
+            del self._queues[canteen_id]
+
+
+live_queue = LiveQueueIndex()
@@ -0,0 +1,140 @@
+import random
+import threading
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .models import Order, OrderStatus
+
+CODE_SPACE = 10000  # Four-digit codes, "0000" to "9999"
+
+# A pickup code is held from payment until the order is collected; every other
+# status either never had one or is terminal and gives it back
+CODE_STATUSES = {OrderStatus.PAID, OrderStatus.PREPARING, OrderStatus.READY}
+
+
+def holds_code(order: Order) -> bool:
+    return order.pickup_code is not None and order.status in CODE_STATUSES
+
+
+class _CodeSpace:
+    """Free codes of one canteen: a list to draw from plus each code's index for O(1) removal"""
+
+    def __init__(self, taken: set[int]) -> None:
+        self.free = [code for code in range(CODE_SPACE) if code not in taken]
+        self.index = {code: i for i, code in enumerate(self.free)}
+
+    def pick(self, exclude: set[int]) -> int | None:
+        """A random free code outside exclude, left in the pool until the order is committed"""
+        if len(self.free) <= sum(1 for code in exclude if code in self.index):
+            return None
+        while True:
+            code = self.free[random.randrange(len(self.free))]
+            if code not in exclude:
+                return code
+
+    def take(self, code: int) -> None:
+        i = self.index.get(code)
+        if i is not None:
+            self._remove_at(i)
+
+    def put(self, code: int) -> None:
+        if code not in self.index:
+            self.index[code] = len(self.free)
+            self.free.append(code)
+
+    def _remove_at(self, i: int) -> None:
+        # Move the last free code into the hole so nothing shifts
+        code = self.free[i]
+        last = self.free.pop()
+        del self.index[code]
+        if last != code:
+            self.free[i] = last
+            self.index[last] = i
+
+
+class PickupCodeAllocator:
+    """
+    Per-canteen pool of free four-digit pickup codes, kept in memory.
+
+    The pool is only a hint: allocate() proposes a random free code in
+    constant time, without a query, and the partial unique index on
+    orders (canteen_id, pickup_code) is what keeps two active orders from
+    sharing one. A code leaves the pool once its order is committed with it
+    and returns when the order reaches a terminal status. Like the live
+    queue, CRUD functions call sync() after each commit, other workers follow
+    along through apply() on order events, and rebuild() reloads the held
+    codes on startup. A canteen's pool is built on first use.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._spaces: dict[int, _CodeSpace] = {}
+        self._held: dict[int, tuple[int, int]] = {}  # order_id -> (canteen_id, code)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spaces.clear()
+            self._held.clear()
+
+    def rebuild(self, db: Session) -> None:
+        rows = db.execute(
+            select(Order.id, Order.canteen_id, Order.pickup_code).where(
+                Order.status.in_(list(CODE_STATUSES)),
+                Order.pickup_code.is_not(None),
+            )
+        ).all()
+        with self._lock:
+            self._spaces.clear()
+            self._held = {order_id: (canteen_id, int(code)) for order_id, canteen_id, code in rows}
+
+    def allocate(self, canteen_id: int, order_id: int, exclude: set[int] | None = None) -> str:
+        """Propose a code for the order, skipping codes in exclude that the database already refused"""
+        exclude = exclude or set()
+        with self._lock:
+            held = self._held.get(order_id)
+            if held is not None and held[0] == canteen_id and held[1] not in exclude:
+                return f"{held[1]:04d}"
+            code = self._space(canteen_id).pick(exclude)
+            if code is None:
+                # Only reachable with 10,000 uncollected paid orders at one canteen
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="No pickup codes free")
+            return f"{code:04d}"
+
+    def sync(self, order: Order) -> None:
+        """Hold or release the order's code depending on its current state"""
+        self.apply(order.id, order.canteen_id, order.pickup_code, holds_code(order))
+
+    def apply(self, order_id: int, canteen_id: int, pickup_code: str | None, held: bool) -> None:
+        """Same as sync() but from plain values, e.g. an event published by another worker"""
+        with self._lock:
+            if held and pickup_code is None:
+                # The event doesn't carry the code, so it says nothing about it
+                return
+            self._release(order_id)
+            if held and pickup_code is not None:
+                code = int(pickup_code)
+                self._held[order_id] = (canteen_id, code)
+                if canteen_id in self._spaces:
+                    self._spaces[canteen_id].take(code)
+
+    def free_count(self, canteen_id: int) -> int:
+        with self._lock:
+            return len(self._space(canteen_id).free)
+
+    def _space(self, canteen_id: int) -> _CodeSpace:
+        space = self._spaces.get(canteen_id)
+        if space is None:
+            taken = {code for cid, code in self._held.values() if cid == canteen_id}
+            space = self._spaces[canteen_id] = _CodeSpace(taken)
+        return space
+
+    def _release(self, order_id: int) -> None:
+        entry = self._held.pop(order_id, None)
+        if entry is None:
+            return
+        canteen_id, code = entry
+        if canteen_id in self._spaces:
+            self._spaces[canteen_id].put(code)
+
+
+pickup_codes = PickupCodeAllocator()
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+from sqlalchemy.orm import Session, make_transient_to_detached
+from .config import settings
+from .models import User
+
+PRINCIPAL_INVALIDATED = "principal.invalidated"
+
+# The password hash never sits in the cache; the few endpoints that need it
+# read it from the database, and a cached user lazy-loads it on access
+_COLUMNS = [column.key for column in User.__table__.columns if column.key != "password_hash"]
+
+
+class PrincipalCache:
+    """
+    TTL-bounded LRU of authenticated user snapshots, keyed on the token subject.
+
+    A hit is turned back into a User attached to the request's session with
+    merge(load=False), so the auth dependency skips its SELECT while endpoints
+    can still lazy-load relationships or modify the user. Endpoints that
+    change a user publish PRINCIPAL_INVALIDATED after committing, so every
+    worker drops its copy through invalidate().
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 60) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, tuple[float, dict[str, Any]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, user_id: int) -> User | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            snapshot = entry[1]
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    def put(self, user: User) -> None:
+        snapshot = {key: getattr(user, key) for key in _COLUMNS}
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {"size": size, "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache(settings.principal_cache_size, settings.principal_cache_ttl_seconds)
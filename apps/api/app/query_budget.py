@@ -0,0 +1,137 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Bound parameter lists of any length ("IN (?, ?, ?)") count as one statement shape
+_PARAM_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+|:\w+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    return _WHITESPACE.sub(" ", _PARAM_LIST.sub("(?)", statement)).strip()
+
+
+class QueryStats:
+    """Statements one request (or one tracked block) sent to the database"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes: Counter[str] = Counter()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        """Statement shapes issued at least threshold times: the usual sign of an N+1 loop"""
+        return {shape: n for shape, n in self.shapes.most_common() if n >= threshold}
+
+
+_active: ContextVar[tuple[QueryStats, ...]] = ContextVar("query_stats", default=())
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _active.get():
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    collectors = _active.get()
+    started = conn.info.get("query_started")
+    if not collectors or not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    for stats in collectors:
+        stats.record(statement, elapsed_ms)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count every statement executed in this context (threadpool and greenlet hops included)"""
+    stats = QueryStats()
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_statements: int, repeat_threshold: int | None = None) -> Iterator[QueryStats]:
+    """
+    Fail the block if it runs more than max_statements statements, or repeats
+    one statement shape repeat_threshold times or more. Meant for tests.
+    """
+    with track_queries() as stats:
+        yield stats
+    problems = []
+    if stats.count > max_statements:
+        problems.append(f"{stats.count} statements, budget is {max_statements}")
+    if repeat_threshold is not None:
+        problems += [f"repeated {n}x: {shape}" for shape, n in stats.repeated(repeat_threshold).items()]
+    if problems:
+        raise QueryBudgetExceeded("; ".join(problems))
+
+
+class QueryStatsMiddleware:
+    """
+    Reports per-request SQL work in X-Query-Count, X-Query-Time-Ms and
+    X-Query-Repeats (statement shapes that look like an N+1 loop).
+
+    Requests over warn_statements statements, or with a repeated shape, are
+    logged with the offending SQL.
+    """
+
+    def __init__(self, app, warn_statements: int = 30, repeat_threshold: int = 5) -> None:
+        self.app = app
+        self.warn_statements = warn_statements
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_stats(message) -> None:
+                if message["type"] == "http.response.start":
+                    repeated = stats.repeated(self.repeat_threshold)
+                    headers = list(message.get("headers", []))
+                    headers += [
+                        (b"x-query-count", str(stats.count).encode()),
+                        (b"x-query-time-ms", f"{stats.total_ms:.1f}".encode()),
+                        (b"x-query-repeats", str(len(repeated)).encode()),
+                    ]
+                    message = {**message, "headers": headers}
+                    self._log(scope, stats, repeated)
+                await send(message)
+
+            await self.app(scope, receive, send_with_stats)
+
+    def _log(self, scope, stats: QueryStats, repeated: dict[str, int]) -> None:
+        if stats.count <= self.warn_statements and not repeated:
+            return
+        logger.warning(
+            "%s %s ran %d statements in %.1f ms%s",
+            scope["method"],
+            scope["path"],
+            stats.count,
+            stats.total_ms,
+            "".join(f"\n  suspected N+1 ({n}x): {shape}" for shape, n in repeated.items()),
+        )
@@ -0,0 +1,75 @@
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from fastapi import Request
+from jose import JWTError, jwt
+from .config import settings
+
+# Users whose writes this request committed, filled in by database._remember_writer
+_writers: ContextVar[list[int] | None] = ContextVar("recent_writes", default=None)
+
+
+def note_recent_write(user_id: int) -> None:
+    writers = _writers.get()
+    if writers is not None and user_id not in writers:
+        writers.append(user_id)
+
+
+def issue_marker(user_id: int, window_seconds: float) -> str:
+    expire = datetime.now(timezone.utc) + timedelta(seconds=window_seconds)
+    payload = {"sub": str(user_id), "typ": "recent_write", "exp": expire}
+    return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
+
+
+def recent_writer(request: Request) -> int | None:
+    """User named by a still-valid write marker on the request, from the cookie or X-Recent-Write"""
+    marker = request.cookies.get(settings.read_your_writes_cookie) or request.headers.get("X-Recent-Write")
+    if not marker:
+        return None
+    try:
+        payload = jwt.decode(marker, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+    except JWTError:
+        return None
+    if payload.get("typ") != "recent_write" or not payload.get("sub"):
+        return None
+    return int(payload["sub"])
+
+
+class ReadYourWritesMiddleware:
+    """
+    Hands a user who just wrote a short-lived signed marker, as a cookie and
+    an X-Recent-Write header, so their next reads stay off the replica on
+    every worker. database.recent_writers only covers the worker that
+    served the write.
+    """
+
+    def __init__(self, app, window_seconds: float = 5) -> None:
+        self.app = app
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writers: list[int] = []
+        token = _writers.set(writers)
+        try:
+            async def send_with_marker(message) -> None:
+                if message["type"] == "http.response.start" and writers:
+                    marker = issue_marker(writers[-1], self.window_seconds)
+                    headers = list(message.get("headers", []))
+                    headers += [
+                        (b"x-recent-write", marker.encode()),
+                        (b"set-cookie", self._cookie(marker).encode()),
+                    ]
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_marker)
+        finally:
+            _writers.reset(token)
+
+    def _cookie(self, marker: str) -> str:
+        secure = settings.frontend_url.startswith("https")
+        cookie = f"{settings.read_your_writes_cookie}={marker}; Max-Age={max(int(self.window_seconds), 1)}; Path=/; HttpOnly"
+        return cookie + ("; SameSite=none; Secure" if secure else "; SameSite=lax")
@@ -0,0 +1,14 @@
+from .crud import rebuild_canteen_capacity
+from .database import SessionLocal
+
+
+def main() -> None:
+    db = SessionLocal()
+    try:
+        rebuild_canteen_capacity(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
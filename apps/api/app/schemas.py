@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field, ConfigDict, field_serializer
 from .models import UserRole, OrderStatus, PaymentStatus, PaymentMethod
 
@@ -167,6 +167,20 @@ class OrderOut(ORMBase):
         return dt.isoformat()
 
 
+OrderView = Literal["summary", "full"]
+
+
+class PaymentSummaryOut(ORMBase):
+    id: int
+    method: PaymentMethod
+    status: PaymentStatus
+
+
+class OrderSummaryOut(OrderOut):
+    """view=summary on order listings: no event timeline, payment method and status only"""
+    payment: Optional[PaymentSummaryOut] = None
+
+
 class PaymentMethodRequest(BaseModel):
     method: PaymentMethod
     upi_id: Optional[str] = None  # For UPI_ID method
@@ -0,0 +1,111 @@
+from datetime import datetime
+from typing import Any
+from .models import Order, as_utc
+from .order_queue import QUEUE_STATUSES
+
+
+def iso(dt: datetime | None) -> str | None:
+    """Same format as the schemas' datetime serializers: naive values are UTC"""
+    return as_utc(dt).isoformat() if dt is not None else None
+
+
+def _order_fields(order: Order) -> dict[str, Any]:
+    """Columns of the order row itself, shared by every view"""
+    return {
+        "id": order.id,
+        "order_number": order.order_number,
+        "student_id": order.student_id,
+        "canteen_id": order.canteen_id,
+        "status": order.status.value,
+        "total_amount_cents": order.total_amount_cents,
+        "payment_expires_at": iso(order.payment_expires_at),
+        "accepted_at": iso(order.accepted_at),
+        "paid_at": iso(order.paid_at),
+        "collected_at": iso(order.collected_at),
+        "cancelled_at": iso(order.cancelled_at),
+        "pickup_code": order.pickup_code,
+        "decline_reason": order.decline_reason,
+        "created_at": iso(order.created_at),
+        "updated_at": iso(order.updated_at),
+    }
+
+
+def _items(order: Order) -> list[dict[str, Any]]:
+    return [
+        {
+            "id": item.id,
+            "menu_item_id": item.menu_item_id,
+            "menu_item_name": item.menu_item_name,
+            "quantity": item.quantity,
+            "unit_price_cents": item.unit_price_cents,
+        }
+        for item in order.items
+    ]
+
+
+def _queue_and_student(order: Order, queue_info: dict | None) -> dict[str, Any]:
+    student = order.student
+    queued = queue_info is not None and order.status in QUEUE_STATUSES
+    return {
+        "queue_position": queue_info["position"] if queued else None,
+        "estimated_minutes": queue_info["estimated_minutes"] if queued else None,
+        "student_name": student.name if student else None,
+        "student_roll_number": student.roll_number if student else None,
+        "student_phone_number": student.phone_number if student else None,
+    }
+
+
+def order_payload(order: Order, queue_info: dict | None = None) -> dict[str, Any]:
+    """
+    JSON-ready OrderOut built in one pass over the ORM object.
+
+    Produces exactly what OrderOut.model_dump(mode="json") would, without
+    validating through pydantic first; list endpoints spend most of their
+    CPU here.
+    """
+    payment = order.payment
+    return {
+        **_order_fields(order),
+        "items": _items(order),
+        "payment": None if payment is None else {
+            "id": payment.id,
+            "amount_cents": payment.amount_cents,
+            "method": payment.method.value,
+            "status": payment.status.value,
+            "qr_payload": payment.qr_payload,
+            "created_at": iso(payment.created_at),
+            "paid_at": iso(payment.paid_at),
+        },
+        "events": [
+            {
+                "id": event.id,
+                "from_status": event.from_status.value if event.from_status else None,
+                "to_status": event.to_status.value,
+                "created_at": iso(event.created_at),
+                "actor_user_id": event.actor_user_id,
+            }
+            for event in order.events
+        ],
+        **_queue_and_student(order, queue_info),
+    }
+
+
+def order_summary_payload(order: Order, queue_info: dict | None = None) -> dict[str, Any]:
+    """
+    OrderSummaryOut: the list-card view of an order.
+
+    Reads only what crud.order_list_options("summary") loads; the event
+    timeline is left empty and the payment carries just its method and status.
+    """
+    payment = order.payment
+    return {
+        **_order_fields(order),
+        "items": _items(order),
+        "payment": None if payment is None else {
+            "id": payment.id,
+            "method": payment.method.value,
+            "status": payment.status.value,
+        },
+        "events": [],
+        **_queue_and_student(order, queue_info),
+    }
@@ -1,20 +1,189 @@
-from typing import Any
+import asyncio
+import uuid
+from collections import deque
+from typing import Any, Iterable
 from fastapi import WebSocket
+from .models import User, UserRole
+
+CAMPUS_TOPIC = "campus"
+
+# Payload keys only sent to sockets connected with ?mode=full
+FULL_PAYLOAD_KEYS = ("order", "queue")
+
+
+def canteen_topic(canteen_id: int) -> str:
+    return f"canteen:{canteen_id}"
+
+
+def student_topic(student_id: int) -> str:
+    return f"student:{student_id}"
+
+
+def topics_for_user(user: User) -> set[str]:
+    """Topics a socket is subscribed to, derived from the authenticated user"""
+    if user.role == UserRole.CAMPUS_ADMIN:
+        return {CAMPUS_TOPIC}
+    if user.role == UserRole.CANTEEN_ADMIN:
+        return {canteen_topic(user.canteen_id)} if user.canteen_id else set()
+    return {student_topic(user.id)}
 
 
 class ConnectionManager:
-    def __init__(self) -> None:
+    """
+    Tracks sockets by topic and fans events out through per-connection queues.
+
+    Every socket gets a bounded outbound queue drained by its own writer task,
+    so broadcast() only enqueues and never waits on a slow client. A socket
+    whose queue is full is treated as a slow consumer and dropped, and a send
+    that fails removes the socket without affecting anyone else.
+
+    Every event is stamped with an increasing seq (scoped to this process's
+    stream id) and kept in a bounded replay buffer. A client reconnecting with
+    its last stream and seq gets the events it missed, or a resync_required
+    message when they have already fallen out of the buffer.
+    """
+
+    def __init__(self, max_queue_size: int = 100, replay_size: int = 1000) -> None:
+        self.max_queue_size = max_queue_size
+        self.stream_id = uuid.uuid4().hex
+        self.seq = 0
+        self._replay: deque[tuple[int, str, dict[str, Any], frozenset[str]]] = deque(maxlen=replay_size)
         self.active_connections: list[WebSocket] = []
+        self.topics: dict[str, set[WebSocket]] = {}
+        self._subscriptions: dict[WebSocket, set[str]] = {}
+        self._queues: dict[WebSocket, asyncio.Queue] = {}
+        self._writers: dict[WebSocket, asyncio.Task] = {}
+        self._full: set[WebSocket] = set()
 
-    async def connect(self, websocket: WebSocket) -> None:
+    async def connect(
+        self,
+        websocket: WebSocket,
+        topics: Iterable[str] = (),
+        full: bool = False,
+        since: int | None = None,
+        stream: str | None = None,
+    ) -> None:
         await websocket.accept()
         self.active_connections.append(websocket)
+        if full:
+            self._full.add(websocket)
+        subscribed = set(topics)
+        self._subscriptions[websocket] = subscribed
+        for topic in subscribed:
+            self.topics.setdefault(topic, set()).add(websocket)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._queues[websocket] = queue
+        self._writers[websocket] = asyncio.create_task(self._writer(websocket, queue))
+        if since is not None:
+            self._resume(websocket, queue, subscribed, full, since, stream)
+        else:
+            # Tell fresh clients where the stream is so they can resume later
+            queue.put_nowait({"type": "hello", "seq": self.seq, "stream": self.stream_id, "payload": {}})
+
+    def _resume(
+        self,
+        websocket: WebSocket,
+        queue: asyncio.Queue,
+        topics: set[str],
+        full: bool,
+        since: int,
+        stream: str | None,
+    ) -> None:
+        """Queue the events a reconnecting client missed, or tell it to resync"""
+        oldest = self._replay[0][0] if self._replay else self.seq + 1
+        if stream != self.stream_id or since > self.seq or since < oldest - 1:
+            queue.put_nowait(self._resync_message())
+            return
+        missed = [
+            self._message(seq, event_type, payload, full)
+            for seq, event_type, payload, event_topics in self._replay
+            if seq > since and event_topics & topics
+        ]
+        if len(missed) > self.max_queue_size:
+            queue.put_nowait(self._resync_message())
+            return
+        for message in missed:
+            queue.put_nowait(message)
+
+    def resync_all(self) -> None:
+        """
+        Events were lost upstream: start a new stream so no client resumes
+        across the gap, and tell every connected client to re-fetch.
+        """
+        self.stream_id = uuid.uuid4().hex
+        self._replay.clear()
+        for connection, queue in list(self._queues.items()):
+            try:
+                queue.put_nowait(self._resync_message())
+            except asyncio.QueueFull:
+                self.disconnect(connection)
+                asyncio.create_task(self._close(connection, 1013, "Too slow"))
+
+    def _resync_message(self) -> dict[str, Any]:
+        return {
+            "type": "resync_required",
+            "seq": self.seq,
+            "stream": self.stream_id,
+            "payload": {},
+        }
+
+    def _message(self, seq: int, event_type: str, payload: dict[str, Any], full: bool) -> dict[str, Any]:
+        if not full:
+            payload = {k: v for k, v in payload.items() if k not in FULL_PAYLOAD_KEYS}
+        return {"type": event_type, "seq": seq, "stream": self.stream_id, "payload": payload}
 
     def disconnect(self, websocket: WebSocket) -> None:
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        self._full.discard(websocket)
+        for topic in self._subscriptions.pop(websocket, set()):
+            subscribers = self.topics.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.topics[topic]
+        self._queues.pop(websocket, None)
+        writer = self._writers.pop(websocket, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+
+    def subscribers(self, topics: Iterable[str]) -> set[WebSocket]:
+        recipients: set[WebSocket] = set()
+        for topic in topics:
+            recipients |= self.topics.get(topic, set())
+        return recipients
+
+    async def broadcast(self, event_type: str, payload: dict[str, Any], topics: Iterable[str]) -> None:
+        topics = frozenset(topics)
+        self.seq += 1
+        self._replay.append((self.seq, event_type, payload, topics))
+        full_message = self._message(self.seq, event_type, payload, full=True)
+        compact_message = self._message(self.seq, event_type, payload, full=False)
+        for connection in self.subscribers(topics):
+            queue = self._queues.get(connection)
+            if queue is None:
+                continue
+            message = full_message if connection in self._full else compact_message
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow consumer: drop it rather than buffer without bound
+                self.disconnect(connection)
+                asyncio.create_task(self._close(connection, 1013, "Too slow"))
+
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue) -> None:
+        while True:
+            message = await queue.get()
+            try:
+                await websocket.send_json(message)
+            except Exception:
+                self.disconnect(websocket)
+                return
 
-    async def broadcast(self, event_type: str, payload: dict[str, Any]) -> None:
-        message = {"type": event_type, "payload": payload}
-        for connection in list(self.active_connections):
-            await connection.send_json(message)
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int, reason: str) -> None:
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
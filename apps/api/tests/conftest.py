@@ -1,16 +1,35 @@
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.database import Base
 from app.models import Canteen, MenuItem, User, UserRole
 from app.auth import hash_password
+from app.crud import create_order, accept_order, pay_order
+from app.order_queue import live_queue
+from app.expiry import expiry_scheduler
+from app.principal_cache import principal_cache
+from app.catalog_cache import catalog_cache
+from app.pickup_codes import pickup_codes
+
+
+@pytest.fixture(autouse=True)
+def fresh_process_state():
+    """Process-wide indexes and caches start empty in every test"""
+    live_queue.clear()
+    expiry_scheduler.clear()
+    principal_cache.clear()
+    catalog_cache.clear()
+    pickup_codes.clear()
 
 
 @pytest.fixture()
 def db():
     engine = create_engine(
-        "sqlite+pysqlite:///:memory:", connect_args={"check_same_thread": False}
+        "sqlite+pysqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,  # One connection, so requests served on other threads see the same data
     )
     TestingSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
     Base.metadata.create_all(engine)
@@ -60,3 +79,24 @@ def seed(db):
         "student": student,
         "admin": admin,
     }
+
+
+@pytest.fixture()
+def accepted_order(db, seed):
+    """Factory for an accepted one-item order from the seeded student, waiting for payment"""
+
+    def make():
+        order = create_order(db, seed["student"], seed["canteen"].id, [{"menu_item_id": seed["menu_items"][0].id, "quantity": 1}])
+        return accept_order(db, order, seed["admin"])
+
+    return make
+
+
+@pytest.fixture()
+def paid_order(db, seed, accepted_order):
+    """Factory for a paid one-item order, queued and holding a pickup code"""
+
+    def make():
+        return pay_order(db, accepted_order(), seed["student"])
+
+    return make
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.auth import create_access_token
+from app.database import Base, RoutingSession, apply_sqlite_pragmas, async_database_url
+from app.deps import get_async_db, get_db
+from app.hashing import password_hasher
+from app.main import app
+from app.models import Hostel
+
+
+@pytest.fixture()
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'offmess.db'}"
+
+
+@pytest.fixture()
+def db(database_url):
+    """File-backed WAL database, split like production: one writer, query_only readers"""
+    writer = create_engine(database_url, connect_args={"check_same_thread": False}, poolclass=QueuePool, pool_size=1, max_overflow=0)
+    reader = create_engine(database_url, connect_args={"check_same_thread": False})
+    apply_sqlite_pragmas(writer)
+    apply_sqlite_pragmas(reader, read_only=True)
+    Base.metadata.create_all(writer)
+    session = sessionmaker(bind=writer, class_=RoutingSession, read_bind=reader, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        writer.dispose()
+        reader.dispose()
+
+
+@pytest.fixture()
+def async_engines(database_url):
+    url = async_database_url(database_url)
+    writer = create_async_engine(url, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0)
+    reader = create_async_engine(url, poolclass=AsyncAdaptedQueuePool, pool_size=2, max_overflow=0)
+    apply_sqlite_pragmas(writer.sync_engine)
+    apply_sqlite_pragmas(reader.sync_engine, read_only=True)
+    statements = {"writer": [], "reader": []}
+    for name, engine in (("writer", writer), ("reader", reader)):
+        event.listen(
+            engine.sync_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args, _name=name: statements[_name].append(statement),
+        )
+    yield writer, reader, statements
+
+
+@pytest.fixture()
+def client(db, async_engines, monkeypatch):
+    writer, reader, _ = async_engines
+    AsyncTestingSession = async_sessionmaker(
+        bind=writer,
+        sync_session_class=RoutingSession,
+        read_bind=reader.sync_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+    async def override_async_db():
+        async with AsyncTestingSession() as session:
+            yield session
+
+    monkeypatch.setattr(password_hasher, "workers", 0)
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_async_db] = override_async_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def auth(user):
+    return {"Authorization": f"Bearer {create_access_token(user.id, user.role.value)}"}
+
+
+def test_login_reads_through_the_query_only_pool(client, seed, async_engines):
+    _, _, statements = async_engines
+    response = client.post("/auth/login", json={"roll_number": "S001", "password": "password123"})
+
+    assert response.status_code == 200
+    assert statements["reader"] and not statements["writer"]
+
+    assert client.post("/auth/login", json={"roll_number": "S001", "password": "wrong"}).status_code == 401
+
+
+def test_canteens_listing(client, seed, async_engines):
+    _, _, statements = async_engines
+    response = client.get("/canteens", headers=auth(seed["student"]))
+
+    assert response.status_code == 200
+    assert [c["name"] for c in response.json()] == ["Main Canteen"]
+    assert not statements["writer"]
+
+
+def test_order_detail(client, seed, paid_order, async_engines):
+    _, _, statements = async_engines
+    order = paid_order()
+
+    response = client.get(f"/orders/{order.id}", headers=auth(seed["student"]))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == order.id
+    assert body["status"] == order.status.value
+    assert body["queue_position"] == 1
+    assert not statements["writer"]
+
+    assert client.get(f"/orders/{order.id + 1}", headers=auth(seed["student"])).status_code == 404
+
+
+def test_async_reader_refuses_writes(db, async_engines):
+    _, reader, _ = async_engines
+
+    async def write():
+        async with reader.connect() as conn:
+            await conn.execute(insert(Hostel).values(name="H1"))
+
+    with pytest.raises(OperationalError, match="readonly"):
+        asyncio.run(write())
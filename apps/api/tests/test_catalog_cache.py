@@ -0,0 +1,73 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.catalog_cache import CatalogCache
+from app.crud import create_order
+from app.database import Base, RoutingSession
+from app.models import Canteen, MenuItem
+
+
+def test_menu_is_served_from_cache_until_invalidated(db, seed):
+    cache = CatalogCache()
+    canteen = seed["canteen"]
+    first = cache.menu(db, canteen.id)
+    assert [item.name for item in first.items] == ["Veg Thali", "Rice Plate", "Dal Fry"]
+
+    db.add(MenuItem(canteen_id=canteen.id, name="Extra", price_cents=1000))
+    db.commit()
+    assert cache.menu(db, canteen.id) is first
+
+    cache.invalidate(canteen.id)
+    second = cache.menu(db, canteen.id)
+    assert len(second.items) == 4
+    assert second.etag != first.etag
+    assert cache.metrics()["hits"] == 1
+
+
+def test_load_racing_an_invalidation_is_not_stored(db, seed):
+    cache = CatalogCache()
+    canteen = seed["canteen"]
+    _, version = cache._cached_menu(canteen.id)
+    stale = db.scalars(cache._menu_query(canteen.id)).all()
+    cache.invalidate(canteen.id)
+    cache._store_menu(canteen.id, stale, version)
+    assert cache._menus == {}
+
+
+def test_active_canteens_and_lookup(db, seed):
+    cache = CatalogCache()
+    canteen = seed["canteen"]
+    assert cache.canteen(db, canteen.id).upi_id == "main@upi"
+    canteen.is_active = False
+    db.commit()
+    cache.invalidate(canteen.id)
+    assert cache.active_canteens(db).items == []
+    assert cache.canteen(db, canteen.id).is_active is False
+
+
+def test_create_order_sees_items_added_after_caching(db, seed):
+    canteen = seed["canteen"]
+    create_order(db, seed["student"], canteen.id, [{"menu_item_id": seed["menu_items"][0].id, "quantity": 1}])
+    extra = MenuItem(canteen_id=canteen.id, name="Extra", price_cents=1000)
+    db.add(extra)
+    db.commit()
+    order = create_order(db, seed["student"], canteen.id, [{"menu_item_id": extra.id, "quantity": 2}])
+    assert order.total_amount_cents == 2000
+
+
+def test_fills_read_the_primary_from_replica_sessions(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(primary)
+    Base.metadata.create_all(replica)
+    Session = sessionmaker(bind=primary, class_=RoutingSession, read_bind=replica, replica=True)
+    with Session() as db:
+        db.add(Canteen(name="New", hours_open="07:00", hours_close="22:00", avg_prep_minutes=10, upi_id="new@upi"))
+        db.commit()
+
+    cache = CatalogCache()
+    with Session() as db:
+        # The replica hasn't caught up with the new canteen yet
+        db.info["read_only"] = True
+        assert [c.name for c in cache.canteens(db).items] == ["New"]
+        assert db.info["read_only"] is True
@@ -0,0 +1,106 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, RoutingSession, apply_sqlite_pragmas, async_database_url, recent_writers
+from app.config import settings
+from app.models import Hostel
+from app.read_your_writes import ReadYourWritesMiddleware, recent_writer
+
+
+def test_async_database_url_uses_async_drivers():
+    assert async_database_url("sqlite:///./offmess.db") == "sqlite+aiosqlite:///./offmess.db"
+    assert async_database_url("postgresql://u:p@db:5432/offmess") == "postgresql+asyncpg://u:p@db:5432/offmess"
+    assert async_database_url("postgresql+psycopg2://u:p@db/offmess") == "postgresql+asyncpg://u:p@db/offmess"
+
+
+def test_routing_session_pins_writes_to_the_writer(tmp_path):
+    url = f"sqlite:///{tmp_path / 'routing.db'}"
+    writer = create_engine(url)
+    reader = create_engine(url)
+    apply_sqlite_pragmas(writer)
+    apply_sqlite_pragmas(reader, read_only=True)
+    Base.metadata.create_all(writer)
+    Session = sessionmaker(bind=writer, class_=RoutingSession, read_bind=reader, autoflush=False)
+
+    with Session() as db:
+        assert db.scalars(select(Hostel)).all() == []
+        assert db.get_bind() is reader
+        db.add(Hostel(name="H1"))
+        db.flush()
+        # Reads after the first write see the uncommitted row
+        assert db.get_bind() is writer
+        assert [h.name for h in db.scalars(select(Hostel))] == ["H1"]
+        db.commit()
+        assert db.get_bind() is reader
+        assert [h.name for h in db.scalars(select(Hostel))] == ["H1"]
+
+    with reader.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 1
+
+
+def test_replica_reads_only_for_read_only_sessions_without_recent_writes(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(primary)
+    Base.metadata.create_all(replica)
+    Session = sessionmaker(bind=primary, class_=RoutingSession, read_bind=replica, replica=True)
+    recent_writers.clear()
+
+    with Session() as db:
+        db.info["principal"] = 7
+        assert db.get_bind() is primary
+        db.info["read_only"] = True
+        assert db.get_bind() is replica
+
+    with Session() as db:
+        db.info["principal"] = 7
+        db.add(Hostel(name="H1"))
+        db.commit()
+
+    with Session() as db:
+        db.info.update(principal=7, read_only=True)
+        # Still inside the read-your-writes window: the replica may not have the row yet
+        assert [h.name for h in db.scalars(select(Hostel))] == ["H1"]
+    with Session() as db:
+        db.info.update(principal=8, read_only=True)
+        assert db.scalars(select(Hostel)).all() == []
+    recent_writers.clear()
+
+
+def test_write_marker_keeps_other_workers_off_the_replica(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(primary)
+    Base.metadata.create_all(replica)
+    Session = sessionmaker(bind=primary, class_=RoutingSession, read_bind=replica, replica=True)
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware, window_seconds=5)
+
+    @app.post("/hostels")
+    def add_hostel():
+        with Session() as db:
+            db.info["principal"] = 7
+            db.add(Hostel(name="H1"))
+            db.commit()
+        return {}
+
+    @app.get("/hostels")
+    def hostels(request: Request):
+        with Session() as db:
+            db.info.update(principal=7, read_only=True, recent_writer=recent_writer(request))
+            return [h.name for h in db.scalars(select(Hostel))]
+
+    client = TestClient(app)
+    response = client.post("/hostels")
+    assert response.headers["X-Recent-Write"]
+    assert settings.read_your_writes_cookie in response.cookies
+    # Another worker never saw the write, only the marker the response carried
+    recent_writers.clear()
+
+    assert client.get("/hostels").json() == ["H1"]
+    client.cookies.clear()
+    assert client.get("/hostels").json() == []
+    assert client.get("/hostels", headers={"X-Recent-Write": response.headers["X-Recent-Write"]}).json() == ["H1"]
@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+
+from app.db_pool import PoolMetrics, instrumented_pool
+
+
+def make_engine(tmp_path, metrics, **kwargs):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        connect_args={"check_same_thread": False},
+        poolclass=instrumented_pool(QueuePool, metrics),
+        **kwargs,
+    )
+    metrics.attach(engine)
+    return engine
+
+
+def test_checkouts_are_counted(tmp_path):
+    metrics = PoolMetrics("test", max_overflow=0)
+    engine = make_engine(tmp_path, metrics, pool_size=2, max_overflow=0)
+    for _ in range(3):
+        with engine.connect():
+            pass
+    data = metrics.metrics()
+    assert data["checkouts"] == 3
+    assert data["checkins"] == 3
+    assert data["connects"] == 1
+    assert data["checked_out"] == 0
+    assert data["waits"] == 0
+
+
+def test_exhausted_pool_records_wait_and_timeout(tmp_path):
+    metrics = PoolMetrics("test", max_overflow=0)
+    engine = make_engine(tmp_path, metrics, pool_size=1, max_overflow=0, pool_timeout=0.2)
+    held = engine.connect()
+    assert metrics.metrics()["checked_out"] == 1
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    assert metrics.metrics()["timeouts"] == 1
+
+    # A waiter that gets the connection once it is returned counts as a wait
+    released = threading.Timer(0.05, held.close)
+    released.start()
+    with engine.connect():
+        pass
+    released.join()
+    data = metrics.metrics()
+    assert data["waits"] == 2
+    assert data["timeouts"] == 1
+    assert data["max_wait_ms"] >= 40
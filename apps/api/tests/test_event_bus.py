@@ -0,0 +1,132 @@
+import asyncio
+import socket
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+
+from app.event_bus import LocalEventBus, PostgresEventBus, SqliteEventBus, create_event_bus, _encode
+
+
+def test_local_bus_delivers_in_process():
+    bus = LocalEventBus()
+    received: list[tuple] = []
+
+    async def deliver(event_type, payload, topics):
+        received.append((event_type, payload, topics))
+
+    async def scenario():
+        await bus.start(deliver)
+        await bus.publish("order.updated", {"order_id": 1}, ["campus"])
+        await bus.stop()
+
+    asyncio.run(scenario())
+    assert received == [("order.updated", {"order_id": 1}, ["campus"])]
+
+
+def test_sqlite_bus_delivers_across_instances(tmp_path):
+    url = f"sqlite:///{tmp_path / 'bus.db'}"
+    worker_a = SqliteEventBus(url, poll_interval=0.01)
+    worker_b = SqliteEventBus(url, poll_interval=0.01)
+    received_a: list[int] = []
+    received_b: list[int] = []
+
+    async def deliver_a(event_type, payload, topics):
+        received_a.append(payload["order_id"])
+
+    async def deliver_b(event_type, payload, topics):
+        received_b.append(payload["order_id"])
+
+    async def scenario():
+        await worker_a.start(deliver_a)
+        await worker_b.start(deliver_b)
+        await worker_a.publish("order.created", {"order_id": 1}, ["canteen:1"])
+        await worker_b.publish("order.updated", {"order_id": 2}, ["canteen:1"])
+        await asyncio.sleep(0.1)
+        await worker_a.stop()
+        await worker_b.stop()
+
+    asyncio.run(scenario())
+    assert received_a == [1, 2]
+    assert received_b == [1, 2]
+
+
+def test_sqlite_bus_waits_for_other_writers(tmp_path):
+    bus = SqliteEventBus(f"sqlite:///{tmp_path / 'bus.db'}")
+    with bus.engine.connect() as conn:
+        assert conn.scalar(text("PRAGMA journal_mode")) == "wal"
+        assert conn.scalar(text("PRAGMA busy_timeout")) > 0
+
+
+class FakeListenConnection:
+    """Stands in for a psycopg2 connection: readable through a socket pair, poll() fails once broken"""
+
+    def __init__(self) -> None:
+        self.sock, self.peer = socket.socketpair()
+        self.notifies: list = []
+        self.closed = 0
+        self.broken = False
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def poll(self) -> None:
+        self.sock.recv(64)
+        if self.broken:
+            raise RuntimeError("server closed the connection unexpectedly")
+
+    def notify(self, message: str) -> None:
+        self.notifies.append(SimpleNamespace(payload=message))
+        self.peer.send(b"x")
+
+    def close(self) -> None:
+        self.closed = 1
+        self.sock.close()
+        self.peer.close()
+
+
+def test_postgres_bus_reconnects_and_resyncs(monkeypatch):
+    bus = PostgresEventBus("postgresql://localhost/app", "order_events", retry_seconds=0.01)
+    connections = [FakeListenConnection(), FakeListenConnection()]
+    listens = iter(connections)
+    attempts = []
+
+    def listen():
+        attempts.append(1)
+        if len(attempts) == 2:
+            raise RuntimeError("connection refused")
+        return next(listens)
+
+    monkeypatch.setattr(bus, "_listen", listen)
+    monkeypatch.setattr(bus, "_connect", lambda: SimpleNamespace(close=lambda: None))
+    received: list[int] = []
+    resyncs: list[int] = []
+
+    async def deliver(event_type, payload, topics):
+        received.append(payload["order_id"])
+
+    async def resync():
+        resyncs.append(1)
+
+    async def scenario():
+        await bus.start(deliver, resync)
+        first, second = connections
+        first.notify(_encode("order.updated", {"order_id": 1}, []))
+        await asyncio.sleep(0.01)
+        first.broken = True
+        first.peer.send(b"x")
+        await asyncio.sleep(0.2)
+        assert first.closed
+        second.notify(_encode("order.updated", {"order_id": 2}, []))
+        await asyncio.sleep(0.01)
+        await bus.stop()
+
+    asyncio.run(scenario())
+    assert received == [1, 2]
+    assert resyncs == [1]
+    assert len(attempts) == 3
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        create_event_bus("redis", "sqlite://", "order_events", 0.2)
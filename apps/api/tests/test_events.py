@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+from app.events import EventDispatcher
+
+
+def test_publish_from_thread_is_dispatched_on_loop():
+    dispatcher = EventDispatcher()
+    received: list[tuple] = []
+
+    async def handler(event_type, payload, topics):
+        received.append((event_type, payload["order_id"], topics))
+
+    async def scenario():
+        task = asyncio.create_task(dispatcher.run(handler))
+        await asyncio.sleep(0)
+        thread = threading.Thread(
+            target=dispatcher.publish,
+            args=("order.updated", {"order_id": 1}, ["campus"]),
+        )
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+    assert received == [("order.updated", 1, ["campus"])]
+    metrics = dispatcher.metrics()
+    assert metrics["published"] == 1
+    assert metrics["dispatched"] == 1
+    assert metrics["queue_depth"] == 0
+
+
+def test_publish_without_running_dispatcher_is_dropped():
+    dispatcher = EventDispatcher()
+    dispatcher.publish("order.updated", {"order_id": 1}, ["campus"])
+    assert dispatcher.metrics()["dropped"] == 1
+
+
+def test_handler_errors_do_not_stop_dispatch(caplog):
+    dispatcher = EventDispatcher()
+    received: list[int] = []
+
+    async def handler(event_type, payload, topics):
+        if payload["order_id"] == 1:
+            raise RuntimeError("boom")
+        received.append(payload["order_id"])
+
+    async def scenario():
+        task = asyncio.create_task(dispatcher.run(handler))
+        await asyncio.sleep(0)
+        dispatcher.publish("order.updated", {"order_id": 1}, [])
+        dispatcher.publish("order.updated", {"order_id": 2}, [])
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+    assert received == [2]
+    assert dispatcher.metrics()["failed"] == 1
+    assert "Event dispatch error for order.updated" in caplog.text
+    assert "boom" in caplog.text
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.crud import pay_order, expire_due_orders, expire_stale_orders
+from app.expiry import ExpiryScheduler, expiry_scheduler
+from app.main import deliver_event
+from app.models import CanteenCapacity, OrderStatus, OrderStatusEvent, PaymentStatus
+
+
+def test_accept_schedules_expiry(db, seed, accepted_order):
+    order = accepted_order()
+
+    assert expiry_scheduler.pending() == 1
+    assert expiry_scheduler.pop_due() == []
+    assert expiry_scheduler.pop_due(order.payment_expires_at + timedelta(seconds=1)) == [order.id]
+
+
+def test_expire_due_orders_skips_paid(db, seed, accepted_order):
+    student = seed["student"]
+    pending = accepted_order()
+    paid = pay_order(db, accepted_order(), student)
+
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    pending.payment_expires_at = past
+    paid.payment_expires_at = past
+    db.commit()
+
+    expired = expire_due_orders(db, [pending.id, paid.id])
+    assert [o.id for o in expired] == [pending.id]
+    assert expired[0].status == OrderStatus.CANCELLED_TIMEOUT
+    assert expired[0].payment.status == PaymentStatus.EXPIRED
+
+    db.refresh(paid)
+    assert paid.status == OrderStatus.PAID
+
+
+def test_scheduler_fires_at_deadline():
+    scheduler = ExpiryScheduler()
+    fired: list[int] = []
+
+    async def scenario():
+        task = asyncio.create_task(scheduler.run(fired.extend))
+        await asyncio.sleep(0)
+        now = datetime.now(timezone.utc)
+        scheduler.schedule(2, now + timedelta(milliseconds=200))
+        scheduler.schedule(1, now + timedelta(milliseconds=50))
+        await asyncio.sleep(0.1)
+        assert fired == [1]
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert fired == [1, 2]
+    assert scheduler.pending() == 0
+
+
+def test_failed_expiry_is_retried_with_backoff():
+    scheduler = ExpiryScheduler(retry_seconds=0.05)
+    calls: list[list[int]] = []
+
+    def on_expire(order_ids):
+        calls.append(list(order_ids))
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+
+    async def scenario():
+        task = asyncio.create_task(scheduler.run(on_expire))
+        await asyncio.sleep(0)
+        scheduler.schedule(1, datetime.now(timezone.utc))
+        await asyncio.sleep(0.02)
+        assert scheduler.pending() == 1
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert calls == [[1], [1]]
+    assert scheduler.pending() == 0
+
+
+def test_each_order_is_expired_by_one_caller_only(db, seed, accepted_order):
+    order = accepted_order()
+    order.payment_expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.commit()
+
+    assert [o.id for o in expire_due_orders(db, [order.id])] == [order.id]
+    # A second worker racing on the same deadline finds nothing left to claim
+    assert expire_due_orders(db, [order.id]) == []
+    timeouts = select(func.count(OrderStatusEvent.id)).where(
+        OrderStatusEvent.order_id == order.id,
+        OrderStatusEvent.to_status == OrderStatus.CANCELLED_TIMEOUT,
+    )
+    assert db.scalar(timeouts) == 1
+    assert db.get(CanteenCapacity, seed["canteen"].id).active == 0
+
+
+def test_same_deadline_is_scheduled_once():
+    scheduler = ExpiryScheduler()
+    deadline = datetime.now(timezone.utc)
+    scheduler.schedule(1, deadline)
+    scheduler.schedule(1, deadline)
+
+    assert scheduler.pending() == 1
+    assert scheduler.pop_due(deadline) == [1]
+
+
+def test_order_events_schedule_the_deadline_in_every_worker(db, seed, accepted_order):
+    order = accepted_order()
+    expiry_scheduler.clear()
+    payload = {
+        "order_id": order.id,
+        "status": order.status.value,
+        "canteen_id": order.canteen_id,
+        "paid_at": None,
+        "payment_expires_at": order.payment_expires_at.isoformat(),
+    }
+
+    asyncio.run(deliver_event("order.accepted", payload, []))
+
+    assert expiry_scheduler.pop_due(order.payment_expires_at) == [order.id]
+
+
+def test_sweep_expires_orders_no_scheduler_fired(db, seed, accepted_order):
+    order = accepted_order()
+    order.payment_expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.commit()
+
+    assert [o.id for o in expire_stale_orders(db)] == [order.id]
+    assert expire_stale_orders(db) == []
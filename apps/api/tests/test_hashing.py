@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app import hashing
+from app.hashing import PasswordHasher
+
+
+@pytest.fixture()
+def hasher():
+    hasher = PasswordHasher(workers=1, max_pending=1, timeout=5)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify_in_pool(hasher):
+    async def run():
+        hashed = await hasher.hash("secret123")
+        return hashed, await hasher.verify("secret123", hashed), await hasher.verify("wrong", hashed)
+
+    _, valid, invalid = asyncio.run(run())
+
+    assert valid
+    assert not invalid
+    metrics = hasher.metrics()
+    assert metrics["completed"] == 3
+    assert metrics["pending"] == 0
+    assert metrics["avg_hash_ms"] > 0
+
+
+def test_rejects_when_saturated(hasher):
+    assert hasher._admit()
+    try:
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(hasher.hash("secret123"))
+    finally:
+        hasher._release()
+
+    assert exc.value.status_code == 503
+    assert hasher.metrics()["rejected"] == 1
+
+
+def test_threaded_when_pool_disabled(monkeypatch):
+    hasher = PasswordHasher(workers=0)
+    threads = []
+
+    def slow_hash(password):
+        threads.append(threading.get_ident())
+        return password[::-1]
+
+    monkeypatch.setattr(hashing, "hash_password", slow_hash)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        hashed = await hasher.hash("secret123")
+        return loop_thread, hashed
+
+    loop_thread, hashed = asyncio.run(run())
+    assert hashed == "321terces"
+    assert threads and threads[0] != loop_thread
+    assert hasher.metrics()["pending"] == 0
@@ -0,0 +1,14 @@
+from app.http_cache import etag_for, etag_matches
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches(None, '"abc"')
+    assert not etag_matches('"def"', '"abc"')
+
+
+def test_etag_is_stable_for_equal_data():
+    assert etag_for({"a": 1, "b": [1, 2]}) == etag_for({"b": [1, 2], "a": 1})
+    assert etag_for({"a": 1}) != etag_for({"a": 2})
@@ -0,0 +1,65 @@
+from fastapi.testclient import TestClient
+
+from app.auth import create_access_token
+from app.crud import update_order_status, get_order_queue_position
+from app.deps import get_db
+from app.main import app
+from app.models import OrderStatus
+from app.order_queue import live_queue
+
+
+def test_queue_positions_follow_paid_at(db, seed, paid_order):
+    first = paid_order()
+    second = paid_order()
+    third = paid_order()
+
+    assert get_order_queue_position(db, first)["position"] == 1
+    assert get_order_queue_position(db, second)["position"] == 2
+    info = get_order_queue_position(db, third)
+    assert info["position"] == 3
+    assert info["estimated_minutes"] == seed["canteen"].avg_prep_minutes * 3
+
+
+def test_ready_order_leaves_queue(db, seed, paid_order):
+    admin = seed["admin"]
+    first = paid_order()
+    second = paid_order()
+
+    update_order_status(db, first, admin, OrderStatus.READY)
+
+    assert get_order_queue_position(db, first)["position"] == 0
+    assert get_order_queue_position(db, second)["position"] == 1
+    assert live_queue.size(seed["canteen"].id) == 1
+
+
+def test_rebuild_from_database(db, seed, paid_order):
+    first = paid_order()
+    second = paid_order()
+
+    live_queue.clear()
+    live_queue.rebuild(db)
+
+    assert live_queue.size(seed["canteen"].id) == 2
+    assert get_order_queue_position(db, first)["position"] == 1
+    assert get_order_queue_position(db, second)["position"] == 2
+
+
+def test_listing_positions_match_order_detail(db, seed, paid_order):
+    admin = seed["admin"]
+    first = paid_order()
+    second = paid_order()
+    third = paid_order()
+    update_order_status(db, first, admin, OrderStatus.READY)
+
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        token = create_access_token(admin.id, admin.role.value)
+        listed = TestClient(app).get("/admin/orders", headers={"Authorization": f"Bearer {token}"}).json()
+    finally:
+        app.dependency_overrides.clear()
+    positions = {o["id"]: (o["queue_position"], o["estimated_minutes"]) for o in listed}
+
+    assert positions[first.id] == (None, None)
+    for order in (second, third):
+        expected = get_order_queue_position(db, order)
+        assert positions[order.id] == (expected["position"], expected["estimated_minutes"])
@@ -1,5 +1,9 @@
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
 from fastapi import HTTPException
 
 from app.crud import (
@@ -7,9 +11,21 @@ from app.crud import (
     accept_order,
     pay_order,
     expire_stale_orders,
-    generate_pickup_code,
+    order_change_token,
+    canteen_status_query,
+    page_orders,
+    encode_order_cursor,
+    update_payment_status,
+    ist_now,
+    decline_order,
+    update_order_status,
+    rebuild_canteen_capacity,
+    admit_order,
 )
-from app.models import Order, OrderStatus, PaymentStatus, MenuItem
+from app.database import Base, apply_sqlite_pragmas
+from app.models import Canteen, CanteenCapacity, Order, OrderStatus, PaymentStatus, MenuItem, User, UserRole
+from app.query_budget import query_budget
+from app.serializers import order_payload
 
 
 def test_create_order_constraints(db, seed):
@@ -60,6 +76,88 @@ def test_active_order_limit(db, seed):
         create_order(db, student, canteen.id, [{"menu_item_id": menu_item.id, "quantity": 1}])
 
 
+def test_terminal_orders_free_their_capacity_slot(db, seed):
+    student = seed["student"]
+    admin = seed["admin"]
+    canteen = seed["canteen"]
+    canteen.max_active_orders = 2
+    db.commit()
+    items = [{"menu_item_id": seed["menu_items"][0].id, "quantity": 1}]
+
+    first = create_order(db, student, canteen.id, items)
+    second = create_order(db, student, canteen.id, items)
+    with pytest.raises(HTTPException):
+        create_order(db, student, canteen.id, items)
+
+    decline_order(db, first, admin, "Out of stock")
+    third = create_order(db, student, canteen.id, items)
+    assert db.get(CanteenCapacity, canteen.id).active == 2
+
+    # Moving between active statuses keeps the slot; collecting gives it back
+    order = update_order_status(db, accept_order(db, second, admin), admin, OrderStatus.PREPARING)
+    assert db.get(CanteenCapacity, canteen.id).active == 2
+    order.status = OrderStatus.READY
+    db.commit()
+    update_order_status(db, order, admin, OrderStatus.COLLECTED)
+    assert db.get(CanteenCapacity, canteen.id).active == 1
+    assert third.status == OrderStatus.REQUESTED
+
+
+def test_capacity_released_when_status_was_not_loaded(db, seed):
+    canteen = seed["canteen"]
+    order = create_order(db, seed["student"], canteen.id, [{"menu_item_id": seed["menu_items"][0].id, "quantity": 1}])
+    db.expire(order)
+
+    # Assigned without ever reading the old status
+    order.status = OrderStatus.DECLINED
+    db.commit()
+
+    assert db.get(CanteenCapacity, canteen.id).active == 0
+
+
+def test_rebuild_canteen_capacity_recounts_active_orders(db, seed):
+    student = seed["student"]
+    canteen = seed["canteen"]
+    items = [{"menu_item_id": seed["menu_items"][0].id, "quantity": 1}]
+    for _ in range(3):
+        create_order(db, student, canteen.id, items)
+    capacity = db.get(CanteenCapacity, canteen.id)
+    capacity.active = 17
+    db.commit()
+
+    rebuild_canteen_capacity(db)
+    db.expire_all()
+    assert db.get(CanteenCapacity, canteen.id).active == 3
+
+
+def test_rebuild_waits_for_an_admission_in_flight(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'capacity.db'}", connect_args={"timeout": 5})
+    apply_sqlite_pragmas(engine)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        canteen = Canteen(name="C", hours_open="07:00", hours_close="22:00", avg_prep_minutes=10, upi_id="c@upi")
+        student = User(role=UserRole.STUDENT, roll_number="S1", password_hash="x")
+        db.add_all([canteen, student])
+        db.commit()
+        canteen_id, student_id = canteen.id, student.id
+
+    in_flight = Session()
+    assert admit_order(in_flight, canteen_id)
+    in_flight.add(Order(student_id=student_id, canteen_id=canteen_id, status=OrderStatus.REQUESTED, total_amount_cents=100))
+    in_flight.flush()
+
+    rebuild = threading.Thread(target=lambda: rebuild_canteen_capacity(Session()))
+    rebuild.start()
+    time.sleep(0.2)
+    in_flight.commit()
+    in_flight.close()
+    rebuild.join()
+
+    with Session() as db:
+        assert db.get(CanteenCapacity, canteen_id).active == 1
+
+
 def test_accept_flow(db, seed):
     student = seed["student"]
     admin = seed["admin"]
@@ -127,22 +225,116 @@ def test_auto_cancel_job(db, seed):
     assert expired[0].status == OrderStatus.CANCELLED_TIMEOUT
 
 
-def test_pickup_code_collision(db, seed, monkeypatch):
-    student = seed["student"]
+def test_order_change_token_tracks_order_and_payment_changes(db, seed):
     canteen = seed["canteen"]
-    menu_item = seed["menu_items"][0]
+    assert order_change_token(db, canteen.id) == (0, None, None)
 
-    order = create_order(db, student, canteen.id, [{"menu_item_id": menu_item.id, "quantity": 1}])
-    order.status = OrderStatus.PAID
-    order.pickup_code = "0001"
+    order = create_order(db, seed["student"], canteen.id, [{"menu_item_id": seed["menu_items"][0].id, "quantity": 1}])
+    created = order_change_token(db, canteen.id)
+    assert created[0] == 1
+
+    order = accept_order(db, order, seed["admin"])
+    accepted = order_change_token(db, canteen.id)
+    assert accepted != created
+
+    # A payment-only change still moves the token
+    update_payment_status(db, order, PaymentStatus.FAILED, seed["admin"])
+    assert order.status == OrderStatus.PAYMENT_PENDING
+    assert order_change_token(db, canteen.id) != accepted
+
+
+def test_order_change_token_covers_only_listed_statuses_and_their_students(db, seed):
+    canteen = seed["canteen"]
+    active = [OrderStatus.PAYMENT_PENDING, OrderStatus.PAID, OrderStatus.PREPARING, OrderStatus.READY]
+    order = create_order(db, seed["student"], canteen.id, [{"menu_item_id": seed["menu_items"][0].id, "quantity": 1}])
+    assert order_change_token(db, canteen.id, active)[0] == 0
+
+    order = accept_order(db, order, seed["admin"])
+    listed = order_change_token(db, canteen.id, active)
+    assert listed[0] == 1
+
+    # The dashboard shows the student's name, so a profile edit is a change too
+    seed["student"].name = "Asha"
+    db.commit()
+    renamed = order_change_token(db, canteen.id, active)
+    assert renamed[:2] == listed[:2]
+    assert renamed != listed
+
+
+def test_canteen_status_query_counts_active_orders_per_canteen(db, seed):
+    canteen = seed["canteen"]
+    other = Canteen(name="Night Canteen", hours_open="18:00", hours_close="02:00", avg_prep_minutes=5, upi_id="night@upi")
+    db.add(other)
+    db.commit()
+    for _ in range(2):
+        create_order(db, seed["student"], canteen.id, [{"menu_item_id": seed["menu_items"][0].id, "quantity": 1}])
+
+    rows = db.execute(canteen_status_query()).all()
+    assert [(c.id, count, admin.id if admin else None) for c, count, admin in rows] == [
+        (canteen.id, 2, seed["admin"].id),
+        (other.id, 0, None),
+    ]
+
+    other.is_active = False
     db.commit()
+    assert [c.id for c, _, _ in db.execute(canteen_status_query()).all()] == [canteen.id]
+    assert db.execute(canteen_status_query(other.id)).one()[0].id == other.id
 
-    calls = iter([1, 2])
 
-    def fake_randint(a, b):
-        return next(calls)
+def test_page_orders_walks_newest_first_across_timestamp_ties(db, seed):
+    canteen = seed["canteen"]
+    menu_item = seed["menu_items"][0]
+    orders = [
+        create_order(db, seed["student"], canteen.id, [{"menu_item_id": menu_item.id, "quantity": 1}])
+        for _ in range(5)
+    ]
+    tied = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    for order in orders[1:4]:
+        order.created_at = tied
+    db.commit()
+
+    seen, cursor = [], None
+    while True:
+        page = db.scalars(page_orders(select(Order), cursor, 2)).all()
+        seen += [o.id for o in page[:2]]
+        if len(page) <= 2:
+            break
+        cursor = encode_order_cursor(page[1])
+    expected = [orders[4].id, orders[0].id, orders[3].id, orders[2].id, orders[1].id]
+    assert seen == expected
+
+    with pytest.raises(HTTPException):
+        page_orders(select(Order), "not-a-cursor", 2)
 
-    monkeypatch.setattr("app.crud.random.randint", fake_randint)
 
-    code = generate_pickup_code(db, canteen.id, attempts=2)
-    assert code == "0002"
+def test_order_numbers_follow_a_daily_sequence(db, seed):
+    student = seed["student"]
+    canteen = seed["canteen"]
+    menu_item = seed["menu_items"][0]
+    today = ist_now().strftime("%Y%m%d")
+
+    numbers = [
+        create_order(db, student, canteen.id, [{"menu_item_id": menu_item.id, "quantity": 1}]).order_number
+        for _ in range(3)
+    ]
+    assert numbers == [f"{today}-0001", f"{today}-0002", f"{today}-0003"]
+
+
+def test_create_order_is_one_fixed_round_of_statements(db, seed):
+    student = seed["student"]
+    canteen = seed["canteen"]
+    menu_items = seed["menu_items"]
+    items = [{"menu_item_id": menu_items[0].id, "quantity": 1}, {"menu_item_id": menu_items[1].id, "quantity": 2}]
+    create_order(db, student, canteen.id, items)  # Warms the catalog cache
+
+    # Capacity check, order number, then one INSERT per table (SQLite can't batch
+    # order_items with RETURNING, so those go one per row here); the response
+    # is built from the objects without reading anything back
+    with query_budget(7) as stats:
+        order = create_order(db, student, canteen.id, items)
+        payload = order_payload(order)
+    assert not any(shape.startswith("SELECT") and "count" not in shape for shape in stats.shapes)
+    assert [item["menu_item_name"] for item in payload["items"]] == [menu_items[0].name, menu_items[1].name]
+    assert payload["payment"]["qr_payload"].endswith(order.order_number)
+    assert [event["to_status"] for event in payload["events"]] == ["REQUESTED"]
+    assert payload["student_name"] == student.name
@@ -0,0 +1,109 @@
+import pytest
+from fastapi import HTTPException
+
+from app.crud import pay_order, update_order_status
+from app.models import OrderStatus
+from app.pickup_codes import CODE_SPACE, PickupCodeAllocator, pickup_codes
+
+
+def _hold(allocator, canteen_id, order_id):
+    code = allocator.allocate(canteen_id, order_id)
+    allocator.apply(order_id, canteen_id, code, held=True)
+    return code
+
+
+def test_allocate_never_repeats_a_held_code():
+    allocator = PickupCodeAllocator()
+    codes = {_hold(allocator, 1, order_id) for order_id in range(CODE_SPACE)}
+    assert len(codes) == CODE_SPACE
+    assert all(len(code) == 4 for code in codes)
+
+    with pytest.raises(HTTPException) as exc:
+        allocator.allocate(1, CODE_SPACE)
+    assert exc.value.status_code == 503
+    # Other canteens have their own code space
+    assert allocator.allocate(2, CODE_SPACE)
+
+
+def test_allocate_only_proposes_a_code():
+    allocator = PickupCodeAllocator()
+    code = allocator.allocate(1, 7)
+    # Nothing is held until the order is committed with the code
+    assert allocator.free_count(1) == CODE_SPACE
+    allocator.apply(7, 1, code, held=True)
+    assert allocator.free_count(1) == CODE_SPACE - 1
+    assert allocator.allocate(1, 7) == code
+    assert allocator.allocate(1, 7, exclude={int(code)}) != code
+
+
+def test_released_code_returns_to_pool():
+    allocator = PickupCodeAllocator()
+    code = _hold(allocator, 1, 7)
+    allocator.apply(7, 1, code, held=False)
+    assert allocator.free_count(1) == CODE_SPACE
+
+    # A code held by another worker's order is taken out of this worker's pool
+    allocator.apply(8, 1, "0042", held=True)
+    assert allocator.free_count(1) == CODE_SPACE - 1
+    assert "0042" not in {_hold(allocator, 1, order_id) for order_id in range(100, 100 + CODE_SPACE - 1)}
+
+
+def test_event_without_code_keeps_it_held():
+    allocator = PickupCodeAllocator()
+    _hold(allocator, 1, 7)
+    allocator.apply(7, 1, None, held=True)
+    assert allocator.free_count(1) == CODE_SPACE - 1
+
+
+def test_code_taken_by_another_worker_is_retried(db, seed, paid_order, monkeypatch):
+    first = paid_order()
+    # This worker's pool never heard of the first order's code
+    pickup_codes.clear()
+    proposals = iter([first.pickup_code])
+    allocate = pickup_codes.allocate
+    monkeypatch.setattr(
+        pickup_codes,
+        "allocate",
+        lambda canteen_id, order_id, exclude=None: next(proposals, None) or allocate(canteen_id, order_id, exclude),
+    )
+
+    second = paid_order()
+
+    assert second.status == OrderStatus.PAID
+    assert second.pickup_code not in (None, first.pickup_code)
+
+
+def test_failed_commit_holds_no_code(db, seed, accepted_order, monkeypatch):
+    order = accepted_order()
+
+    def fail():
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(db, "commit", fail)
+    with pytest.raises(RuntimeError):
+        pay_order(db, order, seed["student"])
+
+    assert pickup_codes.free_count(seed["canteen"].id) == CODE_SPACE
+
+
+def test_collected_order_releases_its_code(db, seed, paid_order):
+    order = paid_order()
+    canteen_id = seed["canteen"].id
+    assert order.pickup_code is not None
+    assert pickup_codes.free_count(canteen_id) == CODE_SPACE - 1
+
+    order = update_order_status(db, order, seed["admin"], OrderStatus.READY)
+    assert pickup_codes.free_count(canteen_id) == CODE_SPACE - 1
+    update_order_status(db, order, seed["admin"], OrderStatus.COLLECTED)
+    assert pickup_codes.free_count(canteen_id) == CODE_SPACE
+
+
+def test_rebuild_reserves_codes_of_uncollected_orders(db, seed, paid_order):
+    first = paid_order()
+    second = paid_order()
+    update_order_status(db, update_order_status(db, second, seed["admin"], OrderStatus.READY), seed["admin"], OrderStatus.COLLECTED)
+
+    allocator = PickupCodeAllocator()
+    allocator.rebuild(db)
+    assert allocator.free_count(seed["canteen"].id) == CODE_SPACE - 1
+    assert allocator.allocate(seed["canteen"].id, first.id) == first.pickup_code
@@ -0,0 +1,83 @@
+import asyncio
+
+from sqlalchemy import event
+
+from app.auth import create_access_token
+from app.deps import _get_user_from_token
+from app.main import deliver_event
+from app.principal_cache import principal_cache, PRINCIPAL_INVALIDATED
+
+
+def _count_statements(db):
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.bind, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def test_cached_principal_skips_user_lookup(db, seed):
+    student = seed["student"]
+    token = create_access_token(student.id, student.role.value)
+
+    _get_user_from_token(db, token)
+    db.expunge_all()
+    statements = _count_statements(db)
+
+    user = _get_user_from_token(db, token)
+
+    assert user.id == student.id
+    assert user.roll_number == student.roll_number
+    assert statements == []
+
+
+def test_cached_principal_can_be_updated(db, seed):
+    student = seed["student"]
+    token = create_access_token(student.id, student.role.value)
+    _get_user_from_token(db, token)
+    db.expunge_all()
+
+    user = _get_user_from_token(db, token)
+    user.name = "Renamed"
+    db.commit()
+    principal_cache.invalidate(user.id)
+    db.expunge_all()
+
+    assert _get_user_from_token(db, token).name == "Renamed"
+
+
+def test_role_claim_mismatch_reloads(db, seed):
+    student = seed["student"]
+    _get_user_from_token(db, create_access_token(student.id, student.role.value))
+    db.expunge_all()
+    statements = _count_statements(db)
+
+    _get_user_from_token(db, create_access_token(student.id, "CAMPUS_ADMIN"))
+
+    assert len(statements) == 1
+
+
+def test_password_hash_not_cached(db, seed):
+    student = seed["student"]
+    token = create_access_token(student.id, student.role.value)
+    _get_user_from_token(db, token)
+
+    assert "password_hash" not in principal_cache._entries[student.id][1]
+
+    db.expunge_all()
+    user = _get_user_from_token(db, token)
+    statements = _count_statements(db)
+
+    assert user.password_hash == student.password_hash
+    assert len(statements) == 1
+
+
+def test_invalidation_event_drops_cached_user(db, seed):
+    student = seed["student"]
+    _get_user_from_token(db, create_access_token(student.id, student.role.value))
+
+    asyncio.run(deliver_event(PRINCIPAL_INVALIDATED, {"user_id": student.id}, []))
+
+    assert student.id not in principal_cache._entries
@@ -0,0 +1,106 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.auth import create_access_token
+from app.crud import create_order, accept_order, order_list_options
+from app.deps import get_db
+from app.main import app
+from app.models import Order
+from app.query_budget import QueryBudgetExceeded, query_budget, statement_shape, track_queries
+from app.serializers import order_payload
+
+ORDERS = 8
+
+# Statements each listing may issue for a page of ORDERS orders, whatever the page size:
+# a per-order lazy load (items, menu_item_name, payment, events) blows through these
+QUERY_BUDGETS = [
+    ("student", "/orders", 4),
+    ("student", "/orders?view=summary", 3),
+    ("admin", "/admin/orders", 5),
+    ("admin", "/admin/orders?view=summary", 4),
+    ("admin", "/admin/orders?status=ACTIVE", 5),
+    ("admin", "/admin/orders/daily?date={today}", 4),
+    ("admin", "/admin/orders/daily?date={today}&view=summary", 3),
+]
+
+
+@pytest.fixture()
+def orders(db, seed):
+    menu_items = seed["menu_items"]
+    created = []
+    for _ in range(ORDERS):
+        order = create_order(
+            db,
+            seed["student"],
+            seed["canteen"].id,
+            [{"menu_item_id": menu_items[0].id, "quantity": 1}, {"menu_item_id": menu_items[1].id, "quantity": 2}],
+        )
+        created.append(accept_order(db, order, seed["admin"]))
+    return created
+
+
+@pytest.fixture()
+def client(db):
+    app.dependency_overrides[get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_statement_shape_collapses_parameter_lists():
+    assert statement_shape("SELECT * FROM t WHERE id IN (?, ?, ?)") == statement_shape(
+        "SELECT *\n  FROM t WHERE id IN (?)"
+    )
+    assert statement_shape("SELECT a FROM t WHERE id IN (%(id_1)s, %(id_2)s)") == "SELECT a FROM t WHERE id IN (?)"
+
+
+def test_query_budget_flags_lazy_loading_loop(db, orders):
+    db.expunge_all()
+    with pytest.raises(QueryBudgetExceeded, match="repeated"):
+        with query_budget(100, repeat_threshold=5):
+            for order in db.scalars(select(Order)).all():
+                [item.menu_item_name for item in order.items]
+
+
+def test_query_budget_passes_with_list_loaders(db, orders):
+    db.expunge_all()
+    with query_budget(3, repeat_threshold=2) as stats:
+        rows = db.scalars(select(Order).options(*order_list_options())).unique().all()
+        [order_payload(order) for order in rows]
+    assert len(rows) == ORDERS
+    assert stats.count == 3
+
+
+def test_track_queries_nests(db, seed):
+    with track_queries() as outer:
+        db.scalar(select(Order.id))
+        with track_queries() as inner:
+            db.scalar(select(Order.id))
+    assert (outer.count, inner.count) == (2, 1)
+
+
+@pytest.mark.parametrize("role,path,budget", QUERY_BUDGETS)
+def test_order_listing_query_budget(client, db, seed, orders, role, path, budget):
+    user = seed[role]
+    token = create_access_token(user.id, user.role.value)
+    today = orders[0].created_at.date().isoformat()
+    db.expunge_all()
+
+    response = client.get(path.format(today=today), headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert len(response.json()) == ORDERS
+    assert int(response.headers["X-Query-Count"]) <= budget
+    assert response.headers["X-Query-Repeats"] == "0"
+
+
+def test_student_summary_listing_carries_student_name(client, db, seed, orders):
+    student = seed["student"]
+    student.name = "Asha"
+    db.commit()
+    token = create_access_token(student.id, student.role.value)
+    db.expunge_all()
+
+    response = client.get("/orders?view=summary", headers={"Authorization": f"Bearer {token}"})
+
+    assert {order["student_name"] for order in response.json()} == {"Asha"}
@@ -0,0 +1,57 @@
+from sqlalchemy import inspect, select
+
+from app.crud import create_order, accept_order, pay_order, get_order_queue_position, order_list_options
+from app.models import Order
+from app.schemas import OrderOut, OrderSummaryOut
+from app.serializers import order_payload, order_summary_payload
+
+
+def _pydantic_payload(order, queue_info=None):
+    expected = OrderOut.model_validate(order).model_dump(mode="json")
+    expected["student_name"] = order.student.name
+    expected["student_roll_number"] = order.student.roll_number
+    expected["student_phone_number"] = order.student.phone_number
+    if queue_info is not None:
+        expected["queue_position"] = queue_info["position"]
+        expected["estimated_minutes"] = queue_info["estimated_minutes"]
+    return expected
+
+
+def test_order_payload_matches_schema_dump(db, seed):
+    student = seed["student"]
+    menu_item = seed["menu_items"][0]
+    order = create_order(db, student, seed["canteen"].id, [{"menu_item_id": menu_item.id, "quantity": 2}])
+
+    # Fresh order: no payment, one event
+    assert order_payload(order) == _pydantic_payload(order)
+
+    order = pay_order(db, accept_order(db, order, seed["admin"]), student)
+    queue_info = get_order_queue_position(db, order)
+    payload = order_payload(order, queue_info)
+
+    assert payload == _pydantic_payload(order, queue_info)
+    assert list(payload) == list(OrderOut.model_fields)
+    assert payload["queue_position"] == 1
+
+
+def test_summary_view_loads_no_event_timeline(db, seed):
+    student = seed["student"]
+    menu_item = seed["menu_items"][0]
+    order = create_order(db, student, seed["canteen"].id, [{"menu_item_id": menu_item.id, "quantity": 2}])
+    order = accept_order(db, order, seed["admin"])
+    order_id, item_name, student_name = order.id, menu_item.name, student.name
+    db.expunge_all()
+
+    order = db.scalars(
+        select(Order).where(Order.id == order_id).options(*order_list_options("summary"))
+    ).one()
+    payload = order_summary_payload(order)
+
+    assert "events" not in inspect(order).unloaded
+    assert order.events == []
+    assert payload["events"] == []
+    assert payload["items"][0]["menu_item_name"] == item_name
+    assert payload["items"][0]["quantity"] == 2
+    assert payload["payment"] == {"id": order.payment.id, "method": "ONLINE", "status": "PENDING"}
+    assert payload["student_name"] == student_name
+    assert OrderSummaryOut.model_validate(payload).model_dump(mode="json") == payload
@@ -0,0 +1,197 @@
+import asyncio
+
+from app.models import User, UserRole
+from app.websockets import (
+    ConnectionManager,
+    CAMPUS_TOPIC,
+    canteen_topic,
+    student_topic,
+    topics_for_user,
+)
+
+
+class FakeWebSocket:
+    def __init__(self, fail: bool = False, block: bool = False) -> None:
+        self.fail = fail
+        self.block = block
+        self.closed_with: int | None = None
+        self.sent: list[dict] = []
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_json(self, message: dict) -> None:
+        if self.fail:
+            raise RuntimeError("socket is gone")
+        if self.block:
+            await asyncio.Event().wait()
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        self.closed_with = code
+
+
+def test_topics_for_user():
+    student = User(id=7, role=UserRole.STUDENT)
+    admin = User(id=8, role=UserRole.CANTEEN_ADMIN, canteen_id=3)
+    campus = User(id=9, role=UserRole.CAMPUS_ADMIN)
+
+    assert topics_for_user(student) == {student_topic(7)}
+    assert topics_for_user(admin) == {canteen_topic(3)}
+    assert topics_for_user(campus) == {CAMPUS_TOPIC}
+
+
+def test_broadcast_only_reaches_matching_topics():
+    manager = ConnectionManager()
+    own_admin, other_admin = FakeWebSocket(), FakeWebSocket()
+    own_student, other_student = FakeWebSocket(), FakeWebSocket()
+
+    async def scenario():
+        await manager.connect(own_admin, {canteen_topic(1)})
+        await manager.connect(other_admin, {canteen_topic(2)})
+        await manager.connect(own_student, {student_topic(10)})
+        await manager.connect(other_student, {student_topic(11)})
+        await manager.broadcast(
+            "order.updated",
+            {"order_id": 1},
+            [canteen_topic(1), student_topic(10), CAMPUS_TOPIC],
+        )
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+
+    assert [m["type"] for m in own_admin.sent] == ["hello", "order.updated"]
+    assert [m["type"] for m in own_student.sent] == ["hello", "order.updated"]
+    assert [m["type"] for m in other_admin.sent] == ["hello"]
+    assert [m["type"] for m in other_student.sent] == ["hello"]
+
+
+def test_disconnect_drops_subscriptions():
+    manager = ConnectionManager()
+    ws = FakeWebSocket()
+
+    async def scenario():
+        await manager.connect(ws, {canteen_topic(1)})
+        manager.disconnect(ws)
+
+    asyncio.run(scenario())
+
+    assert manager.active_connections == []
+    assert manager.topics == {}
+
+
+def test_failed_send_only_removes_that_socket():
+    manager = ConnectionManager()
+    dead, healthy = FakeWebSocket(fail=True), FakeWebSocket()
+
+    async def scenario():
+        await manager.connect(dead, {canteen_topic(1)})
+        await manager.connect(healthy, {canteen_topic(1)})
+        await manager.broadcast("order.updated", {"order_id": 1}, [canteen_topic(1)])
+        await asyncio.sleep(0.01)
+        await manager.broadcast("order.updated", {"order_id": 2}, [canteen_topic(1)])
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+
+    assert manager.active_connections == [healthy]
+    assert [m["payload"].get("order_id") for m in healthy.sent] == [None, 1, 2]
+
+
+def test_slow_consumer_is_dropped_without_blocking_others():
+    manager = ConnectionManager(max_queue_size=2)
+    slow, fast = FakeWebSocket(block=True), FakeWebSocket()
+
+    async def scenario():
+        await manager.connect(slow, {CAMPUS_TOPIC})
+        await manager.connect(fast, {CAMPUS_TOPIC})
+        for order_id in range(5):
+            await manager.broadcast("order.updated", {"order_id": order_id}, [CAMPUS_TOPIC])
+            await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+
+    assert manager.active_connections == [fast]
+    assert slow.closed_with == 1013
+    assert len(fast.sent) == 6
+
+
+def test_full_mode_receives_order_and_queue():
+    manager = ConnectionManager()
+    full, compact = FakeWebSocket(), FakeWebSocket()
+    payload = {"order_id": 1, "order": {"id": 1}, "queue": [{"order_id": 1, "queue_position": 1}]}
+
+    async def scenario():
+        await manager.connect(full, {CAMPUS_TOPIC}, full=True)
+        await manager.connect(compact, {CAMPUS_TOPIC})
+        await manager.broadcast("order.updated", payload, [CAMPUS_TOPIC])
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+
+    assert full.sent[-1]["payload"] == payload
+    assert compact.sent[-1]["payload"] == {"order_id": 1}
+
+
+def test_reconnect_replays_missed_events():
+    manager = ConnectionManager()
+    first, resumed = FakeWebSocket(), FakeWebSocket()
+    other_canteen = FakeWebSocket()
+
+    async def scenario():
+        await manager.connect(first, {canteen_topic(1)})
+        await manager.broadcast("order.created", {"order_id": 1}, [canteen_topic(1)])
+        await asyncio.sleep(0.01)
+        manager.disconnect(first)
+        await manager.broadcast("order.updated", {"order_id": 1}, [canteen_topic(1)])
+        await manager.broadcast("order.created", {"order_id": 2}, [canteen_topic(2)])
+        await manager.broadcast("order.created", {"order_id": 3}, [canteen_topic(1)])
+        last = first.sent[-1]
+        await manager.connect(resumed, {canteen_topic(1)}, since=last["seq"], stream=last["stream"])
+        await manager.connect(other_canteen, {canteen_topic(2)}, since=last["seq"], stream="old-stream")
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+
+    assert [(m["type"], m["payload"]["order_id"]) for m in resumed.sent] == [
+        ("order.updated", 1),
+        ("order.created", 3),
+    ]
+    assert [m["seq"] for m in resumed.sent] == [2, 4]
+    assert [m["type"] for m in other_canteen.sent] == ["resync_required"]
+
+
+def test_reconnect_past_replay_buffer_requires_resync():
+    manager = ConnectionManager(replay_size=2)
+    ws = FakeWebSocket()
+
+    async def scenario():
+        for order_id in range(5):
+            await manager.broadcast("order.created", {"order_id": order_id}, [CAMPUS_TOPIC])
+        await manager.connect(ws, {CAMPUS_TOPIC}, since=1, stream=manager.stream_id)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+
+    assert ws.sent == [
+        {"type": "resync_required", "seq": 5, "stream": manager.stream_id, "payload": {}}
+    ]
+
+
+def test_resync_all_starts_a_new_stream():
+    manager = ConnectionManager()
+    live, resumed = FakeWebSocket(), FakeWebSocket()
+
+    async def scenario():
+        await manager.connect(live, {CAMPUS_TOPIC})
+        await manager.broadcast("order.created", {"order_id": 1}, [CAMPUS_TOPIC])
+        await asyncio.sleep(0.01)
+        old_stream = manager.stream_id
+        manager.resync_all()
+        await manager.connect(resumed, {CAMPUS_TOPIC}, since=manager.seq, stream=old_stream)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+
+    assert [m["type"] for m in live.sent] == ["hello", "order.created", "resync_required"]
+    assert [m["type"] for m in resumed.sent] == ["resync_required"]
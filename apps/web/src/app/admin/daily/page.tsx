@@ -1,16 +1,18 @@
 "use client";
 
 import { useState, useEffect } from "react";
-import { apiFetch } from "@/lib/api";
-import { Order } from "@/lib/types";
+import { apiFetchPage } from "@/lib/api";
+import { OrderSummary } from "@/lib/types";
 import StatusBadge from "@/components/StatusBadge";
 import { useAuth } from "@/components/AuthProvider";
 
 export default function DailyOrdersPage() {
   const { user, loading: authLoading } = useAuth();
   const [date, setDate] = useState(() => new Date().toISOString().slice(0, 10));
-  const [orders, setOrders] = useState<Order[]>([]);
+  const [orders, setOrders] = useState<OrderSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
   const load = async (showLoading = true) => {
@@ -21,8 +23,9 @@ export default function DailyOrdersPage() {
     if (showLoading) setLoading(true);
     setError(null);
     try {
-      const data = await apiFetch<Order[]>(`/admin/orders/daily?date=${date}`);
-      setOrders(data);
+      const page = await apiFetchPage<OrderSummary>(`/admin/orders/daily?date=${date}&view=summary`);
+      setOrders(page.items);
+      setNextCursor(page.nextCursor);
     } catch (err: any) {
       console.error("Daily orders fetch error:", err);
       if (err?.message?.includes('401') || err?.message?.includes('Unauthorized')) {
@@ -33,11 +36,26 @@ export default function DailyOrdersPage() {
         setError(err?.message || "Failed to load orders");
       }
       setOrders([]);
+      setNextCursor(null);
     } finally {
       if (showLoading) setLoading(false);
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await apiFetchPage<OrderSummary>(`/admin/orders/daily?date=${date}&view=summary`, nextCursor);
+      setOrders((prev) => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (err: any) {
+      setError(err?.message || "Failed to load more orders");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     if (user?.role === "CANTEEN_ADMIN" && user.canteen_id) {
       load();
@@ -159,6 +177,15 @@ export default function DailyOrdersPage() {
           </div>
         ))}
         {orders.length === 0 && <p className="text-sm text-neutral-500">No orders for this date.</p>}
+        {nextCursor && (
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="rounded-full border border-neutral-200 dark:border-neutral-700 px-4 py-2 text-sm disabled:opacity-60"
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </button>
+        )}
       </div>
     </div>
   );
@@ -1,13 +1,24 @@
 "use client";
 
 import { useEffect, useState, useRef } from "react";
-import { apiFetch, getSocketUrl } from "@/lib/api";
-import { MenuItem, Order, OrderResponse, OrderStatus, PaymentMethod } from "@/lib/types";
+import { apiFetch, apiFetchAll, getSocketUrl, SocketResume } from "@/lib/api";
+import { MenuItem, OrderEventPayload, OrderSummary, OrderResponse, OrderStatus, PaymentMethod, QueueEntry } from "@/lib/types";
 import { useAuth } from "@/components/AuthProvider";
 import StatusBadge from "@/components/StatusBadge";
 import { requestNotificationPermission, notifyNewOrder } from "@/lib/notifications";
 import NotificationButton from "@/components/NotificationButton";
 
+const ACTIVE_STATUSES: OrderStatus[] = ["PAYMENT_PENDING", "PAID", "PREPARING", "READY"];
+
+const applyQueue = (orders: OrderSummary[], queue: QueueEntry[]): OrderSummary[] => {
+  const positions = new Map(queue.map((entry) => [entry.order_id, entry]));
+  return orders.map((o) => {
+    const entry = positions.get(o.id);
+    if (!entry) return o;
+    return { ...o, queue_position: entry.queue_position, estimated_minutes: entry.estimated_minutes };
+  });
+};
+
 const statusToNext: Partial<Record<OrderStatus, OrderStatus>> = {
   PAID: "READY",  // For backward compatibility with existing orders
   PREPARING: "READY",
@@ -22,8 +33,8 @@ interface CanteenProfile {
 
 export default function AdminDashboard() {
   const { user, loading: authLoading } = useAuth();
-  const [incomingOrders, setIncomingOrders] = useState<Order[]>([]);
-  const [activeOrders, setActiveOrders] = useState<Order[]>([]);
+  const [incomingOrders, setIncomingOrders] = useState<OrderSummary[]>([]);
+  const [activeOrders, setActiveOrders] = useState<OrderSummary[]>([]);
   const [menuItems, setMenuItems] = useState<MenuItem[]>([]);
   const [menuEdits, setMenuEdits] = useState<
     Record<number, { is_available: boolean }>
@@ -75,8 +86,8 @@ export default function AdminDashboard() {
       if (showLoading) setLoading(true);
       setError(null);
       const [incoming, active] = await Promise.all([
-        apiFetch<Order[]>("/admin/orders?status=REQUESTED"),
-        apiFetch<Order[]>("/admin/orders?status=ACTIVE"),
+        apiFetchAll<OrderSummary>("/admin/orders?status=REQUESTED&view=summary"),
+        apiFetchAll<OrderSummary>("/admin/orders?status=ACTIVE&view=summary"),
       ]);
       
       // Check for new orders and show notifications
@@ -107,6 +118,32 @@ export default function AdminDashboard() {
     }
   };
 
+  // Patch local lists from a full-mode WebSocket event instead of re-fetching
+  const applyOrderEvent = (payload: OrderEventPayload) => {
+    const order = payload.order;
+    if (!order) {
+      loadOrders(false);
+      return;
+    }
+    const queue = payload.queue || [];
+    const byNewest = (a: OrderSummary, b: OrderSummary) => b.created_at.localeCompare(a.created_at);
+
+    setIncomingOrders((prev) => {
+      const rest = prev.filter((o) => o.id !== order.id);
+      if (order.status !== "REQUESTED") return rest;
+      if (!previousIncomingOrderIds.current.has(order.id)) {
+        previousIncomingOrderIds.current.add(order.id);
+        notifyNewOrder(order.id, order.student_name || "Student", order.total_amount_cents / 100);
+      }
+      return [order, ...rest].sort(byNewest);
+    });
+    setActiveOrders((prev) => {
+      const rest = prev.filter((o) => o.id !== order.id);
+      const next = ACTIVE_STATUSES.includes(order.status) ? [order, ...rest].sort(byNewest) : rest;
+      return applyQueue(next, queue);
+    });
+  };
+
   const loadMenu = async () => {
     try {
       setError(null);
@@ -159,30 +196,48 @@ export default function AdminDashboard() {
     
     console.log("Setting up real-time updates for admin dashboard");
     
-    // Try WebSocket first, fallback to polling
+    // Try WebSocket first, poll only while it is reconnecting
     let ws: WebSocket | null = null;
     let pollingInterval: NodeJS.Timeout | null = null;
+    let reconnectTimer: NodeJS.Timeout | null = null;
+    let reconnectDelay = 1000;
+    let disposed = false;
+    // Last event seen, so a reconnect only replays what was missed
+    let resume: SocketResume | undefined;
     
     const startPolling = () => {
+      if (pollingInterval) return;
       console.log("Using polling for real-time updates");
-      setWsConnected(false);
       pollingInterval = setInterval(() => {
         loadOrders(false);
       }, 3000); // Poll every 3 seconds
     };
     
+    const stopPolling = () => {
+      if (pollingInterval) {
+        clearInterval(pollingInterval);
+        pollingInterval = null;
+      }
+    };
+    
+    const scheduleReconnect = () => {
+      if (disposed || reconnectTimer) return;
+      reconnectTimer = setTimeout(() => {
+        reconnectTimer = null;
+        connect();
+      }, reconnectDelay);
+      reconnectDelay = Math.min(reconnectDelay * 2, 30000);
+    };
+    
     const connect = () => {
       try {
-        ws = new WebSocket(getSocketUrl());
+        ws = new WebSocket(getSocketUrl("full", resume));
         
         ws.onopen = () => {
           console.log("WebSocket connected for real-time updates");
           setWsConnected(true);
-          // Clear polling if WebSocket works
-          if (pollingInterval) {
-            clearInterval(pollingInterval);
-            pollingInterval = null;
-          }
+          reconnectDelay = 1000;
+          stopPolling();
         };
         
         ws.onmessage = (event) => {
@@ -190,8 +245,14 @@ export default function AdminDashboard() {
             const data = JSON.parse(event.data);
             console.log("Real-time update received:", data);
             
-            if (data.type?.startsWith("order.")) {
+            if (typeof data.seq === "number" && data.stream) {
+              resume = { seq: data.seq, stream: data.stream };
+            }
+            if (data.type === "resync_required") {
+              // Missed events are gone from the server buffer, reload once
               loadOrders(false);
+            } else if (data.type?.startsWith("order.")) {
+              applyOrderEvent(data.payload as OrderEventPayload);
             }
           } catch (err) {
             console.error("WebSocket message error:", err);
@@ -199,20 +260,21 @@ export default function AdminDashboard() {
         };
         
         ws.onclose = () => {
-          console.log("WebSocket disconnected, using polling");
+          console.log("WebSocket disconnected, reconnecting");
           setWsConnected(false);
+          if (disposed) return;
           startPolling();
+          scheduleReconnect();
         };
         
         ws.onerror = (error) => {
-          console.log("WebSocket error, using polling:", error);
-          setWsConnected(false);
-          startPolling();
+          console.log("WebSocket error:", error);
         };
       } catch (err) {
         console.log("WebSocket connection error, using polling:", err);
         setWsConnected(false);
         startPolling();
+        scheduleReconnect();
       }
     };
     
@@ -220,7 +282,9 @@ export default function AdminDashboard() {
     connect();
     
     return () => {
-      if (pollingInterval) clearInterval(pollingInterval);
+      disposed = true;
+      stopPolling();
+      if (reconnectTimer) clearTimeout(reconnectTimer);
       if (ws) {
         ws.close();
       }
@@ -300,7 +364,7 @@ export default function AdminDashboard() {
     setDeclineDialogs(prev => ({ ...prev, [orderId]: false }));
   };
 
-  const advance = async (order: Order) => {
+  const advance = async (order: OrderSummary) => {
     const next = statusToNext[order.status];
     if (!next) return;
     
@@ -2,7 +2,7 @@
 
 import { useEffect, useState } from "react";
 import { apiFetch, getSocketUrl } from "@/lib/api";
-import { Canteen, MenuItem } from "@/lib/types";
+import { Canteen, CanteenStatus, MenuItem } from "@/lib/types";
 import { useAuth } from "@/components/AuthProvider";
 
 interface CanteenWithDetails extends Canteen {
@@ -57,15 +57,18 @@ export default function CampusAdminPage() {
   const loadCanteens = async () => {
     try {
       setError(null);
-      const canteensList = await apiFetch<Canteen[]>("/canteens");
+      const [canteensList, statuses] = await Promise.all([
+        apiFetch<Canteen[]>("/canteens"),
+        apiFetch<CanteenStatus[]>("/canteens/status"),
+      ]);
+      const statusById = new Map(statuses.map((status) => [status.canteen_id, status] as const));
       
       const detailedCanteens = await Promise.all(
         canteensList.map(async (canteen) => {
           try {
-            const [status, menu] = await Promise.all([
-              apiFetch<any>(`/canteens/${canteen.id}/status`),
-              apiFetch<MenuItem[]>(`/canteens/${canteen.id}/menu`)
-            ]);
+            const status = statusById.get(canteen.id);
+            if (!status) throw new Error("Missing status");
+            const menu = await apiFetch<MenuItem[]>(`/canteens/${canteen.id}/menu`);
             
             return {
               ...canteen,
@@ -75,9 +78,9 @@ export default function CampusAdminPage() {
               active_orders: status.active_orders,
               can_accept_orders: status.can_accept_orders,
               menu_items: menu,
-              admin_name: status.admin_name,
-              admin_phone: status.admin_phone,
-              admin_email: status.admin_email,
+              admin_name: status.admin_name ?? undefined,
+              admin_phone: status.admin_phone ?? undefined,
+              admin_email: status.admin_email ?? undefined,
             };
           } catch (err) {
             return {
@@ -1,16 +1,20 @@
 "use client";
 
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import Link from "next/link";
-import { apiFetch, getSocketUrl } from "@/lib/api";
-import { Canteen, Order } from "@/lib/types";
+import { apiFetch, apiFetchPage, getSocketUrl } from "@/lib/api";
+import { Canteen, OrderSummary } from "@/lib/types";
 import { useAuth } from "@/components/AuthProvider";
 import StatusBadge from "@/components/StatusBadge";
 
 export default function OrdersPage() {
   const { user, loading } = useAuth();
   const [canteens, setCanteens] = useState<Canteen[]>([]);
-  const [orders, setOrders] = useState<Order[]>([]);
+  const [orders, setOrders] = useState<OrderSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Once older pages are loaded, refreshes keep them and only replace the newest page
+  const loadedMore = useRef(false);
   const [searchQuery, setSearchQuery] = useState("");
   const [dateRange, setDateRange] = useState<string>("ALL");
   const [priceRange, setPriceRange] = useState<string>("ALL");
@@ -81,10 +85,32 @@ export default function OrdersPage() {
 
   const loadOrders = async () => {
     try {
-      const data = await apiFetch<Order[]>("/orders");
-      setOrders(data);
+      const page = await apiFetchPage<OrderSummary>("/orders?view=summary");
+      const fresh = new Set(page.items.map((order) => order.id));
+      setOrders((prev) =>
+        loadedMore.current ? [...page.items, ...prev.filter((order) => !fresh.has(order.id))] : page.items
+      );
+      if (!loadedMore.current) setNextCursor(page.nextCursor);
     } catch {
-      setOrders([]);
+      if (!loadedMore.current) setOrders([]);
+    }
+  };
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await apiFetchPage<OrderSummary>("/orders?view=summary", nextCursor);
+      loadedMore.current = true;
+      setOrders((prev) => {
+        const seen = new Set(prev.map((order) => order.id));
+        return [...prev, ...page.items.filter((order) => !seen.has(order.id))];
+      });
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Failed to load more orders:", err);
+    } finally {
+      setLoadingMore(false);
     }
   };
 
@@ -272,7 +298,7 @@ export default function OrdersPage() {
         {/* Results Count */}
         {orders.length > 0 && (
           <div className="text-sm text-neutral-600 dark:text-neutral-400">
-            Showing {filteredOrders.length} of {orders.length} orders
+            Showing {filteredOrders.length} of {orders.length} {nextCursor ? "loaded " : ""}orders
           </div>
         )}
       </div>
@@ -368,6 +394,16 @@ export default function OrdersPage() {
           ))}
         </div>
       )}
+
+      {nextCursor && (
+        <button
+          onClick={loadMore}
+          disabled={loadingMore}
+          className="w-full px-4 py-3 bg-neutral-50 dark:bg-neutral-800 hover:bg-neutral-200 dark:hover:bg-neutral-700 text-neutral-700 dark:text-neutral-300 text-sm font-medium rounded-xl transition-colors disabled:opacity-60"
+        >
+          {loadingMore ? "Loading..." : "Load older orders"}
+        </button>
+      )}
     </div>
   );
 }
@@ -3,7 +3,7 @@
 import { useEffect, useMemo, useState } from "react";
 import Link from "next/link";
 import { apiFetch, getSocketUrl } from "@/lib/api";
-import { Canteen, Order } from "@/lib/types";
+import { Canteen, CanteenStatus, OrderSummary } from "@/lib/types";
 import { useAuth } from "@/components/AuthProvider";
 import StatusBadge from "@/components/StatusBadge";
 import MessMenuCard from "@/components/MessMenuCard";
@@ -19,7 +19,7 @@ interface CanteenWithStatus extends Canteen {
 export default function HomePage() {
   const { user, loading } = useAuth();
   const [canteens, setCanteens] = useState<CanteenWithStatus[]>([]);
-  const [orders, setOrders] = useState<Order[]>([]);
+  const [orders, setOrders] = useState<OrderSummary[]>([]);
   const canteenMap = useMemo(() => {
     const map = new Map<number, string>();
     canteens.forEach((canteen) => map.set(canteen.id, canteen.name));
@@ -31,32 +31,33 @@ export default function HomePage() {
     
     const loadCanteens = async () => {
       try {
-        const canteensList = await apiFetch<Canteen[]>("/canteens");
+        const [canteensList, statuses] = await Promise.all([
+          apiFetch<Canteen[]>("/canteens"),
+          apiFetch<CanteenStatus[]>("/canteens/status").catch(() => [] as CanteenStatus[]),
+        ]);
+        const statusById = new Map(statuses.map((status) => [status.canteen_id, status] as const));
         
-        const canteensWithStatus = await Promise.all(
-          canteensList.map(async (canteen) => {
-            try {
-              const status = await apiFetch<any>(`/canteens/${canteen.id}/status`);
-              return {
-                ...canteen,
-                is_open: status.is_open,
-                accepting_orders: status.accepting_orders,
-                can_accept_orders: status.can_accept_orders,
-                active_orders: status.active_orders,
-                max_orders: status.max_orders,
-              };
-            } catch {
-              return {
-                ...canteen,
-                is_open: false,
-                accepting_orders: false,
-                can_accept_orders: false,
-                active_orders: 0,
-                max_orders: 0,
-              };
-            }
-          })
-        );
+        const canteensWithStatus = canteensList.map((canteen) => {
+          const status = statusById.get(canteen.id);
+          if (!status) {
+            return {
+              ...canteen,
+              is_open: false,
+              accepting_orders: false,
+              can_accept_orders: false,
+              active_orders: 0,
+              max_orders: 0,
+            };
+          }
+          return {
+            ...canteen,
+            is_open: status.is_open,
+            accepting_orders: status.accepting_orders,
+            can_accept_orders: status.can_accept_orders,
+            active_orders: status.active_orders,
+            max_orders: status.max_orders,
+          };
+        });
         
         setCanteens(canteensWithStatus);
       } catch {
@@ -65,7 +66,7 @@ export default function HomePage() {
     };
     
     loadCanteens();
-    apiFetch<Order[]>("/orders").then(setOrders).catch(() => setOrders([]));
+    apiFetch<OrderSummary[]>("/orders?limit=3&view=summary").then(setOrders).catch(() => setOrders([]));
   }, [user]);
 
   useEffect(() => {
@@ -75,7 +76,7 @@ export default function HomePage() {
       try {
         const data = JSON.parse(event.data);
         if (data.type?.startsWith("order.")) {
-          apiFetch<Order[]>("/orders").then(setOrders).catch(() => null);
+          apiFetch<OrderSummary[]>("/orders?limit=3&view=summary").then(setOrders).catch(() => null);
         }
       } catch {
         return;
@@ -1,31 +1,36 @@
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
-export async function apiFetch<T>(path: string, options: RequestInit = {}): Promise<T> {
-  try {
-    const res = await fetch(`${API_URL}${path}`, {
-      ...options,
-      credentials: "include",
-      headers: {
-        "Content-Type": "application/json",
-        ...(options.headers || {}),
-      },
-    });
-
-    if (!res.ok) {
-      let errorMessage = res.statusText;
+async function request(path: string, options: RequestInit = {}): Promise<Response> {
+  const res = await fetch(`${API_URL}${path}`, {
+    ...options,
+    credentials: "include",
+    headers: {
+      "Content-Type": "application/json",
+      ...(options.headers || {}),
+    },
+  });
+
+  if (!res.ok) {
+    let errorMessage = res.statusText;
+    try {
+      const errorData = await res.json();
+      errorMessage = errorData.detail || errorData.message || errorMessage;
+    } catch {
+      // If JSON parsing fails, try to get text
       try {
-        const errorData = await res.json();
-        errorMessage = errorData.detail || errorData.message || errorMessage;
+        errorMessage = await res.text() || errorMessage;
       } catch {
-        // If JSON parsing fails, try to get text
-        try {
-          errorMessage = await res.text() || errorMessage;
-        } catch {
-          // If text parsing also fails, use statusText
-        }
+        // If text parsing also fails, use statusText
       }
-      throw new Error(errorMessage);
     }
+    throw new Error(errorMessage);
+  }
+  return res;
+}
+
+export async function apiFetch<T>(path: string, options: RequestInit = {}): Promise<T> {
+  try {
+    const res = await request(path, options);
 
     if (res.status === 204) {
       return {} as T;
@@ -38,9 +43,55 @@ export async function apiFetch<T>(path: string, options: RequestInit = {}): Prom
   }
 }
 
-export function getSocketUrl(): string {
+export interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
+// Fetch one page of a paginated list endpoint; pass nextCursor back in for the page after it
+export async function apiFetchPage<T>(path: string, cursor?: string | null, pageSize = 50): Promise<Page<T>> {
+  try {
+    const url = new URL(path, "http://placeholder");
+    url.searchParams.set("limit", String(pageSize));
+    if (cursor) url.searchParams.set("cursor", cursor);
+    const res = await request(`${url.pathname}${url.search}`);
+    return { items: (await res.json()) as T[], nextCursor: res.headers.get("X-Next-Cursor") };
+  } catch (error) {
+    console.error(`API Error (${path}):`, error);
+    throw error;
+  }
+}
+
+// Fetch every page of a paginated list endpoint, following X-Next-Cursor.
+// Only for lists that are bounded anyway, like the active orders of one canteen
+export async function apiFetchAll<T>(path: string, pageSize = 200): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const page: Page<T> = await apiFetchPage<T>(path, cursor, pageSize);
+    items.push(...page.items);
+    cursor = page.nextCursor;
+  } while (cursor);
+  return items;
+}
+
+export interface SocketResume {
+  seq: number;
+  stream: string;
+}
+
+export function getSocketUrl(mode?: "full", resume?: SocketResume): string {
   const url = new URL(API_URL);
   url.protocol = url.protocol === "https:" ? "wss:" : "ws:";
   url.pathname = "/ws/orders";
+  if (mode) {
+    // Full mode events carry the serialized order and the canteen queue
+    url.searchParams.set("mode", mode);
+  }
+  if (resume) {
+    // Replay only the events missed since the last one we saw
+    url.searchParams.set("since", String(resume.seq));
+    url.searchParams.set("stream", resume.stream);
+  }
   return url.toString();
 }
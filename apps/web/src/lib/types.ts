@@ -34,6 +34,21 @@ export interface Canteen {
   is_active: boolean;
 }
 
+export interface CanteenStatus {
+  canteen_id: number;
+  is_open: boolean;
+  accepting_orders: boolean;
+  current_time: string;
+  hours_open: string;
+  hours_close: string;
+  active_orders: number;
+  max_orders: number;
+  can_accept_orders: boolean;
+  admin_name?: string | null;
+  admin_phone?: string | null;
+  admin_email?: string | null;
+}
+
 export interface MenuItem {
   id: number;
   canteen_id: number;
@@ -60,6 +75,13 @@ export interface Payment {
   paid_at?: string | null;
 }
 
+// Payment as returned by order listings with view=summary
+export interface PaymentSummary {
+  id: number;
+  method: PaymentMethod;
+  status: PaymentStatus;
+}
+
 export interface OrderEvent {
   id: number;
   from_status?: OrderStatus | null;
@@ -95,10 +117,33 @@ export interface Order {
   student_phone_number?: string | null;
 }
 
+// Order listings with view=summary: events come back empty and payment is trimmed
+export interface OrderSummary extends Omit<Order, "payment"> {
+  payment?: PaymentSummary | null;
+}
+
 export interface OrderResponse {
   order: Order;
 }
 
+export interface QueueEntry {
+  order_id: number;
+  queue_position: number;
+  estimated_minutes: number;
+}
+
+export interface OrderEventPayload {
+  order_id: number;
+  status: OrderStatus;
+  canteen_id: number;
+  student_id: number;
+  updated_at: string;
+  event_type: string;
+  // Only present on sockets opened with ?mode=full
+  order?: Order;
+  queue?: QueueEntry[];
+}
+
 export interface StatsRow {
   canteen_id: number;
   canteen_name: string;